@@ -0,0 +1 @@
+# offline benchmarks, see BENCHMARKS in README.md
@@ -0,0 +1,245 @@
+# static data compile against a local stand-in for the Riot API, with made up latency on every request
+# usage: python -m benchmarks.compile [--latency 0.05] [--workers 8] [--scale 1.0] [-o out.json]
+#
+# cassiopeia can't be pointed at another host, so StandInAPI plays it: the same get_* functions, returning objects
+# with the attributes static._compile_* read, and champions that fetch their spells/passive/skins on first use like
+# cass' do. everything goes over HTTP to a local server handing out benchmarks/fixture.py data. compiles once with
+# one worker and once with --workers, checks both come out the same as the fixture and reports the speedup.
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import *
+
+from plugins.lol import static
+from . import fixture
+
+CHAMPION_SUMMARY = ("id", "name", "title", "blurb", "tags", "image")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: 'StandIn'
+
+    def do_GET(self):
+        self.server.count()
+        time.sleep(self.server.delay())
+        body = self.server.routes.get(self.path)
+        if body is None:
+            return self.send_error(404)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandIn(ThreadingHTTPServer):
+    """Serves the static data in `raw` (a snapshot), waiting `latency` seconds (+- `jitter`) before every response.
+    Champion lists only have the basics, the rest is one more request per champion.
+    """
+    daemon_threads = True
+    # every worker connects at once
+    request_queue_size = 128
+
+    def __init__(self, raw: dict, latency: float, jitter: float=0.0, seed: int=1):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.rng: random.Random = random.Random(seed)
+        self.requests: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+        routes = {
+            "/versions": [raw["version"]],
+            "/champions": [{key: champ[key] for key in CHAMPION_SUMMARY} for champ in raw["champions"]],
+            "/items": raw["items"],
+            "/runes": raw["runes"],
+            "/summoner_spells": raw["summoner_spells"],
+            "/maps": raw["maps"]
+        }
+        for champ in raw["champions"]:
+            # prices and dates come from skins.json, not the API
+            skins = [{key: skin[key] for key in ("id", "name", "loading_image_url", "splash_url")}
+                     for skin in champ["skins"]]
+            routes[f"/champions/{champ['id']}"] = {"passive": champ["passive"], "spells": champ["spells"],
+                                                   "skins": skins}
+        self.routes: Dict[str, bytes] = {path: json.dumps(data).encode() for path, data in routes.items()}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+
+def _image(image: dict) -> SimpleNamespace:
+    return SimpleNamespace(group=image["group"], full=image["full"])
+
+
+def _variables(spell: dict) -> List[SimpleNamespace]:
+    return [SimpleNamespace(**var) for var in spell["variables"]]
+
+
+def _data(spell: dict, **extra) -> Dict[str, SimpleNamespace]:
+    # cass keeps the raw fields it doesn't wrap in _data, see static.find_in_data
+    return {"dto": SimpleNamespace(costBurn=spell["cost_burn"], cooldownBurn=spell["cooldown_burn"],
+                                   rangeBurn=spell["range_burn"], effectBurn=spell["effect_burn"], **extra)}
+
+
+class StandInChampion(object):
+    """A champion that fetches its passive, spells and skins the first time one of them is used.
+    """
+    def __init__(self, api: 'StandInAPI', summary: dict):
+        self.api: StandInAPI = api
+        self.id: int = summary["id"]
+        self.name: str = summary["name"]
+        self.title: str = summary["title"]
+        self.blurb: str = summary["blurb"]
+        self.tags: List[str] = summary["tags"]
+        self.image: SimpleNamespace = _image(summary["image"])
+        self._details: Optional[dict] = None
+
+    def details(self) -> dict:
+        if self._details is None:
+            self._details = self.api.get(f"/champions/{self.id}")
+        return self._details
+
+    @property
+    def passive(self) -> SimpleNamespace:
+        passive = self.details()["passive"]
+        return SimpleNamespace(name=passive["name"], description=passive["description"],
+                               sanitized_description=passive["sanitized_description"],
+                               image_info=_image(passive["image"]))
+
+    @property
+    def spells(self) -> List[SimpleNamespace]:
+        return [SimpleNamespace(name=spell["name"], keyboard_key=SimpleNamespace(name=spell["keyboard_key"]),
+                                description=spell["description"],
+                                sanitized_description=spell["sanitized_description"], tooltip=spell["tooltip"],
+                                image_info=_image(spell["image"]), variables=_variables(spell), _data=_data(spell))
+                for spell in self.details()["spells"]]
+
+    @property
+    def skins(self) -> List[SimpleNamespace]:
+        return [SimpleNamespace(**skin) for skin in self.details()["skins"]]
+
+
+class StandInAPI(object):
+    """The part of cassiopeia static.compile_snapshot uses, talking to a StandIn server at `url`.
+    """
+    def __init__(self, url: str):
+        self.url: str = url
+
+    def get(self, path: str) -> Any:
+        with urllib.request.urlopen(self.url + path) as response:
+            return json.loads(response.read().decode())
+
+    def get_versions(self) -> List[str]:
+        return self.get("/versions")
+
+    def get_champions(self) -> List[StandInChampion]:
+        return [StandInChampion(self, champ) for champ in self.get("/champions")]
+
+    def get_items(self) -> List[SimpleNamespace]:
+        ids = lambda ids: [SimpleNamespace(id=x) for x in ids]
+        return [SimpleNamespace(id=item["id"], name=item["name"], description=item["description"],
+                                plaintext=item["plaintext"], image=_image(item["image"]),
+                                gold=SimpleNamespace(**item["gold"]), maps=ids(item["maps"]),
+                                builds_from=ids(item["builds_from"]), builds_into=ids(item["builds_into"]))
+                for item in self.get("/items")]
+
+    def get_runes(self) -> List[SimpleNamespace]:
+        return [SimpleNamespace(id=rune["id"], name=rune["name"], long_description=rune["long_description"],
+                                path=SimpleNamespace(value=rune["path"]), tier=rune["tier"],
+                                image=SimpleNamespace(url=rune["image_url"]))
+                for rune in self.get("/runes")]
+
+    def get_summoner_spells(self) -> List[SimpleNamespace]:
+        return [SimpleNamespace(id=spell["id"], name=spell["name"], tooltip=spell["tooltip"],
+                                cooldowns=spell["cooldowns"], variables=_variables(spell),
+                                image=_image(spell["image"]),
+                                _data=_data(spell, summonerLevel=spell["summoner_level"], modes=spell["modes"]))
+                for spell in self.get("/summoner_spells")]
+
+    def get_maps(self) -> List[SimpleNamespace]:
+        return [SimpleNamespace(name=name, id=id) for name, id in self.get("/maps").items()]
+
+
+def compile_once(server: StandIn, workers: int, raw: dict) -> dict:
+    """Compiles a snapshot from `server` with `workers` workers and checks it against `raw`.
+
+    Returns:
+        dict: the wall clock time, number of requests and whether it matched.
+    """
+    server.requests = 0
+    start = time.perf_counter()
+    compiled = static.compile_snapshot({}, f"static-{workers}.json", StandInAPI(server.url), workers)
+    seconds = time.perf_counter() - start
+    # through json so tuples and lists compare equal
+    matches = json.loads(json.dumps(compiled)) == raw
+    print(f"{workers} worker(s): {seconds:.2f}s, {server.requests} requests, "
+          f"{'matches' if matches else 'DOES NOT MATCH'} the fixture", file=sys.stderr)
+    return {"workers": workers, "seconds": seconds, "requests": server.requests, "matches_fixture": matches}
+
+
+def main(argv: List[str]=None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compile",
+                                     description="Static data compile against a local Riot API stand-in")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--latency", type=float, default=.05, help="seconds the stand-in waits before responding")
+    parser.add_argument("--jitter", type=float, default=0, help="latency varies by up to this much either way")
+    parser.add_argument("--workers", type=int, default=8, help="workers to compare against one")
+    parser.add_argument("--seed", type=int, default=1, help="fixture and jitter seed")
+    parser.add_argument("--scale", type=float, default=1.0, help="fixture size, 1.0 is about the real data")
+    args = parser.parse_args(argv)
+
+    raw, quotes, prices = fixture.make(args.seed, args.scale)
+    raw = json.loads(json.dumps(raw))
+    server = StandIn(raw, args.latency, args.jitter, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="lol-compile-") as directory, contextlib.redirect_stdout(sys.stderr):
+        # compile_snapshot reads these from data/
+        os.makedirs(os.path.join(directory, "data"))
+        for name, data in (("quotes.json", quotes), ("skins.json", prices)):
+            with open(os.path.join(directory, "data", name), "w") as f:
+                json.dump(data, f)
+        os.chdir(directory)
+        try:
+            runs = [compile_once(server, workers, raw) for workers in (1, args.workers)]
+        finally:
+            os.chdir(cwd)
+            server.shutdown()
+            server.server_close()
+
+    speedup = runs[0]["seconds"] / runs[1]["seconds"]
+    print(f"speedup with {args.workers} workers: {speedup:.1f}x", file=sys.stderr)
+    report = {"meta": {"args": vars(args), "version": raw["version"]}, "runs": runs, "speedup": speedup}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# fake static data for benchmarking without a Riot API key
+# writes a snapshot in the same format static.compile_snapshot does (plus the quotes.json/skins.json it'd be
+# compiled from), sized and shaped roughly like the real thing. everything comes from a seeded RNG so two runs
+# with the same arguments benchmark the exact same data.
+import json
+import os
+import random
+from typing import *
+
+from plugins.lol import static
+
+WORDS = ("blade storm fire frost shadow light void dark iron star moon sun wind stone blood night dawn "
+         "spirit thorn ember tide rune soul wild steel rift glacial arcane").split()
+TAGS = ("Assassin", "Fighter", "Mage", "Marksman", "Support", "Tank")
+LINKS = ("spelldamage", "attackdamage", "bonusattackdamage", "bonushealth", "armor", "@player.level", "@text",
+         "@stacks", "@dynamic.abilitypower", "@special.unknown")
+PATHS = ("Precision", "Domination", "Sorcery", "Resolve", "Inspiration")
+MAPS = {"Summoner's Rift": 11, "Howling Abyss": 12, "Nexus Blitz": 21, "The Twisted Treeline": 10}
+MODES = ("CLASSIC", "ARAM", "KINGPORO", "GAMEMODEX", "URF", "ODIN")
+
+
+def _name(rng: random.Random, words: int=2) -> str:
+    return ' '.join(rng.choice(WORDS).title() for _ in range(words))
+
+
+def _html(rng: random.Random, sentences: int, mention: str="") -> str:
+    # roughly what ddragon text looks like: a few tags, line breaks and the odd name in it
+    parts = []
+    for x in range(sentences):
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+        if mention and x == 0:
+            text = f"{mention} {text}"
+        parts.append(f'<span class="colorFF9900">{text}</span>' if rng.random() < .3 else text.capitalize() + '.')
+    return "<br><br>".join(parts)
+
+
+def _burns(rng: random.Random, effects: int) -> Dict[str, Any]:
+    ranks = lambda base, step: '/'.join(str(base + step * x) for x in range(5))
+    return {
+        "cost_burn": ranks(rng.randrange(20, 100, 5), 5),
+        "cooldown_burn": ranks(rng.randint(4, 20), -1),
+        "range_burn": str(rng.randrange(300, 1200, 25)),
+        "effect_burn": [""] + [ranks(rng.randrange(20, 200, 10), rng.randrange(10, 50, 5)) for _ in range(effects)]
+    }
+
+
+def _variables(rng: random.Random, num: int) -> List[dict]:
+    return [{"key": f"a{x + 1}" if x < 2 else f"f{x - 1}", "link": rng.choice(LINKS),
+             "coefficients": [round(rng.uniform(.1, 1.5), 2) for _ in range(rng.choice((1, 1, 5)))]}
+            for x in range(num)]
+
+
+def _tooltip(rng: random.Random, effects: int, variables: int) -> str:
+    placeholders = [f"{{{{ e{x + 1} }}}}" for x in range(effects)]
+    placeholders += [f"{{{{ a{x + 1} }}}}" if x < 2 else f"{{{{ f{x - 1} }}}}" for x in range(variables)]
+    # and one that nothing fills in, like the real data has
+    placeholders += ["{{ cost }}", "{{ f9 }}"]
+    rng.shuffle(placeholders)
+    text = _html(rng, len(placeholders)).split("<br><br>")
+    return "<br><br>".join(f"{sentence} {placeholder}" for sentence, placeholder in zip(text, placeholders))
+
+
+def make(seed: int=1, scale: float=1.0) -> Tuple[dict, Dict[str, List[str]], Dict[str, Tuple[int, str]]]:
+    """Generate fake static data.
+
+    Args:
+        seed: Seed for the RNG.
+        scale: Multiplier on the number of champions/items/runes (1.0 is about the size of the real data).
+
+    Returns:
+        Tuple[dict, Dict[str, List[str]], Dict[str, Tuple[int, str]]]: the raw snapshot, quotes.json and skins.json.
+    """
+    rng = random.Random(seed)
+    quotes: Dict[str, List[str]] = {}
+    prices: Dict[str, Tuple[int, str]] = {}
+
+    champions: List[dict] = []
+    skin_id = 1000
+    for x in range(max(1, int(140 * scale))):
+        name = WORDS[x].title() if x < len(WORDS) else f"{rng.choice(WORDS).title()}{x}"
+        spells = []
+        for key in "QWER":
+            effects, variables = rng.randint(1, 5), rng.randint(0, 4)
+            spell_name = _name(rng)
+            spells.append({
+                "name": spell_name,
+                "keyboard_key": key,
+                "description": _html(rng, rng.randint(1, 3), mention=name),
+                "sanitized_description": ' '.join(rng.choice(WORDS) for _ in range(40)),
+                "tooltip": _tooltip(rng, effects, variables),
+                "image": {"group": "spell", "full": f"{name}{key}.png"},
+                "variables": _variables(rng, variables),
+                **_burns(rng, effects)
+            })
+        skins = []
+        for num in range(rng.randint(1, 12)):
+            skin_id += 1
+            skins.append({"id": skin_id, "name": "default" if num == 0 else f"{_name(rng, 1)} {name}",
+                          "loading_image_url": f"http://ddragon.leagueoflegends.com/cdn/img/champion/loading/{name}_{num}.jpg",
+                          "splash_url": f"http://ddragon.leagueoflegends.com/cdn/img/champion/splash/{name}_{num}.jpg"})
+            if num and rng.random() < .9:
+                prices[str(skin_id)] = (rng.choice((-1, 10, 520, 750, 975, 1350, 1820, 3250)),
+                                        f"{rng.randint(2009, 2018)}-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}")
+        if rng.random() < .8:
+            quotes[name] = [f'"{_html(rng, 1)}"' for _ in range(rng.randint(1, 8))]
+
+        champions.append({
+            "id": x + 1,
+            "name": name,
+            "title": f"the {_name(rng)}",
+            "blurb": _html(rng, rng.randint(2, 5), mention=name),
+            "tags": rng.sample(TAGS, rng.randint(1, 2)),
+            "image": {"group": "champion", "full": f"{name}.png"},
+            "passive": {"name": _name(rng), "description": _html(rng, rng.randint(1, 3), mention=name),
+                        "sanitized_description": ' '.join(rng.choice(WORDS) for _ in range(30)),
+                        "image": {"group": "passive", "full": f"{name}_P.png"}},
+            "spells": spells,
+            "skins": [dict(skin, price=prices.get(str(skin["id"]), (None, None))[0],
+                           date=prices.get(str(skin["id"]), (None, None))[1]) for skin in skins]
+        })
+
+    items: List[dict] = []
+    num_items = max(3, int(280 * scale))
+    for x in range(num_items):
+        total = rng.choice((0, 300, 350, 400, 435, 800, 900, 1100, 1300, 2600, 2900, 3100, 3400))
+        items.append({"id": 1001 + x, "name": f"{_name(rng)} {x}", "description": _html(rng, rng.randint(1, 4)),
+                      "plaintext": ' '.join(rng.choice(WORDS) for _ in range(8)),
+                      "image": {"group": "item", "full": f"{1001 + x}.png"},
+                      "gold": {"total": total, "sell": int(total * .7), "base": total // 3},
+                      "maps": rng.sample(sorted(MAPS.values()), rng.randint(1, 4)),
+                      "builds_from": [], "builds_into": []})
+    # the last two thirds build out of the first third
+    for item in items[num_items // 3:]:
+        for component in rng.choices(items[:num_items // 3], k=rng.randint(1, 3)):
+            item["builds_from"].append(component["id"])
+            if item["id"] not in component["builds_into"]:
+                component["builds_into"].append(item["id"])
+
+    runes = [{"id": 8000 + x, "name": _name(rng), "long_description": _html(rng, rng.randint(1, 3)),
+              "path": PATHS[x % len(PATHS)], "tier": (x // len(PATHS)) % 4,
+              "image_url": f"http://ddragon.leagueoflegends.com/cdn/img/perk-images/{8000 + x}.png"}
+             for x in range(max(len(PATHS), int(60 * scale)))]
+
+    summoner_spells = []
+    for x, name in enumerate(("Flash", "Ignite", "Heal", "Barrier", "Exhaust", "Teleport", "Smite", "Cleanse",
+                              "Ghost", "Clarity", "Mark", "To the King!", "Poro Toss")):
+        effects, variables = rng.randint(1, 3), rng.randint(0, 2)
+        summoner_spells.append({"id": x + 1, "name": name, "tooltip": _tooltip(rng, effects, variables),
+                                "cooldowns": [float(rng.randrange(60, 360, 30))],
+                                "summoner_level": rng.randint(1, 10), "modes": rng.sample(MODES, rng.randint(1, 4)),
+                                "variables": _variables(rng, variables),
+                                "image": {"group": "spell", "full": f"Summoner{x}.png"}, **_burns(rng, effects)})
+
+    raw = {
+        "format": static.FORMAT,
+        "version": "8.24.1",
+        "champions": champions,
+        "items": items,
+        "runes": runes,
+        "summoner_spells": summoner_spells,
+        "maps": MAPS,
+        "quotes": quotes
+    }
+    return raw, quotes, prices
+
+
+def write(directory: str, seed: int=1, scale: float=1.0) -> str:
+    """Write static.json, quotes.json and skins.json to `directory`.
+
+    Returns:
+        str: the path of the snapshot.
+    """
+    raw, quotes, prices = make(seed, scale)
+    os.makedirs(directory, exist_ok=True)
+    for name, data in (("static.json", raw), ("quotes.json", quotes), ("skins.json", prices)):
+        with open(os.path.join(directory, name), "w") as f:
+            json.dump(data, f, separators=(',', ':'))
+    return os.path.join(directory, "static.json")
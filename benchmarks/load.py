@@ -0,0 +1,316 @@
+# synthetic load: drives the LoLTrivia cog with fake channels, members and messages, no network involved
+# usage: python -m benchmarks.load [--channels 500] [--rate 200] [--duration 30] [--ramp 500 --steps 5] [-o out.json]
+#
+# every channel plays games back to back while answers (right, almost right and unrelated chatter) stream in at
+# --rate messages per second over all channels. reports event loop lag, on_message latency, memory and db throughput
+# per step, with --ramp adding channels each step until the loop can't keep up (--max-lag).
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import *
+
+from plugins.lol.metrics import rss_mb
+from .run import configure, typo
+
+CHATTER = ("lol", "gg", "who is that", "no idea", "pls nerf", "what", "is it ahri?", "brb", "first", "ez",
+           "this one is hard", "?", "idk", "jungle diff", "report my team")
+
+
+class FakeUser(object):
+    def __init__(self, id: int, bot: bool=False):
+        self.id: int = id
+        self.name: str = f"user{id}"
+        self.discriminator: str = f"{id % 10000:04}"
+        self.mention: str = f"<@{id}>"
+        self.bot: bool = bot
+
+
+class FakeGuild(object):
+    def __init__(self, id: int):
+        self.id: int = id
+
+    def get_member(self, discord_id: int) -> None:
+        return None
+
+
+class FakeChannel(object):
+    """A text channel. Sending "takes" `latency` seconds, like a round trip to Discord would.
+    """
+    def __init__(self, id: int, guild: FakeGuild, latency: float):
+        self.id: int = id
+        self.guild: FakeGuild = guild
+        self.latency: float = latency
+        self.sent: int = 0
+
+    async def send(self, *args, **kwargs) -> None:
+        self.sent += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+class FakeMessage(object):
+    def __init__(self, content: str, author: FakeUser, channel: FakeChannel):
+        self.content: str = content
+        self.author: FakeUser = author
+        self.channel: FakeChannel = channel
+        self.guild: FakeGuild = channel.guild
+
+
+class FakeContext(object):
+    def __init__(self, message: FakeMessage):
+        self.message: FakeMessage = message
+        self.author: FakeUser = message.author
+        self.guild: FakeGuild = message.guild
+        # the harness calls the cog directly, not through a command
+        self.command = None
+
+    async def send(self, *args, **kwargs) -> None:
+        await self.message.channel.send(*args, **kwargs)
+
+
+class FakeClient(object):
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop: asyncio.AbstractEventLoop = loop
+        self.user: FakeUser = FakeUser(1, bot=True)
+
+    def get_user(self, discord_id: int) -> None:
+        return None
+
+    async def change_presence(self, **kwargs) -> None:
+        pass
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of `samples` (seconds) in milliseconds.
+    """
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    return {"count": len(samples), "p50_ms": pick(.5), "p95_ms": pick(.95), "p99_ms": pick(.99),
+            "max_ms": samples[-1] * 1000}
+
+
+class Harness(object):
+    def __init__(self, cog, args: argparse.Namespace, rng: random.Random, guild_ids: Sequence[int]=None):
+        self.cog = cog
+        self.args: argparse.Namespace = args
+        self.rng: random.Random = rng
+        self.channels: List[FakeChannel] = []
+        self.members: List[FakeUser] = [FakeUser(10 ** 17 + x) for x in range(args.members)]
+        if guild_ids is None:
+            guild_ids = [10 ** 16 + x for x in range(args.guilds)]
+        self.guilds: List[FakeGuild] = [FakeGuild(x) for x in guild_ids]
+        self.games: List[asyncio.Task] = []
+        self.handlers: Set[asyncio.Task] = set()
+
+        self.lag: List[float] = []
+        self.latency: List[float] = []
+        self.sent_messages: int = 0
+        self.dropped: int = 0
+        self.running: bool = True
+
+    def add_channels(self, num: int) -> None:
+        for _ in range(num):
+            channel = FakeChannel(10 ** 15 + len(self.channels), self.rng.choice(self.guilds), self.args.send_latency)
+            self.channels.append(channel)
+            self.games.append(asyncio.ensure_future(self.play(channel)))
+
+    async def play(self, channel: FakeChannel) -> None:
+        # spread the starts out so every channel isn't on the same beat
+        await asyncio.sleep(self.rng.random() * 2)
+        host = self.rng.choice(self.members)
+        while self.running:
+            ctx = FakeContext(FakeMessage("!trivia", host, channel))
+            await self.cog.start_trivia(ctx, self.args.questions)
+
+    def message(self) -> Optional[FakeMessage]:
+        channel = self.rng.choice(self.channels)
+        game = self.cog.games.get(channel)
+        live = [q for q in game.questions if q] if game else []
+        author = self.rng.choice(self.members)
+        roll = self.rng.random()
+        if live and roll < self.args.correct:
+            content = self.rng.choice(self.rng.choice(live).a)
+        elif live and roll < self.args.correct + self.args.near:
+            content = typo(self.rng, self.rng.choice(self.rng.choice(live).a))
+        else:
+            content = self.rng.choice(CHATTER)
+        return FakeMessage(content, author, channel)
+
+    async def handle(self, message: FakeMessage) -> None:
+        start = time.perf_counter()
+        await self.cog.on_message(message)
+        self.latency.append(time.perf_counter() - start)
+
+    async def traffic(self) -> None:
+        # poisson arrivals at --rate messages/second over every channel
+        loop = asyncio.get_event_loop()
+        next_at = loop.time()
+        while self.running:
+            next_at += self.rng.expovariate(self.args.rate)
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(self.handlers) >= self.args.max_in_flight:
+                # the bot isn't keeping up, count it instead of queueing forever
+                self.dropped += 1
+                continue
+            task = asyncio.ensure_future(self.handle(self.message()))
+            self.handlers.add(task)
+            task.add_done_callback(self.handlers.discard)
+            self.sent_messages += 1
+
+    async def monitor_lag(self, interval: float=.05) -> None:
+        loop = asyncio.get_event_loop()
+        while self.running:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.lag.append(max(0.0, loop.time() - start - interval))
+
+    def reset(self) -> None:
+        self.lag, self.latency = [], []
+        self.sent_messages = self.dropped = 0
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from plugins.lol import trivia, util
+    from plugins.lol.metrics import METRICS
+
+    loop = asyncio.get_event_loop()
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    cog = trivia.LoLTrivia(FakeClient(loop))
+    await cog.ready.wait()
+    harness = Harness(cog, args, rng)
+    background = [asyncio.ensure_future(harness.traffic()), asyncio.ensure_future(harness.monitor_lag())]
+
+    steps = []
+    counts = [args.channels] + [args.ramp] * (args.steps - 1 if args.ramp else 0)
+    for step, add in enumerate(counts):
+        harness.add_channels(add)
+        harness.reset()
+        db_before = METRICS.histograms.get(("db", "add_score"))
+        writes_before = db_before.count if db_before else 0
+        correct_before = METRICS.counters.get(("answers", "correct"), 0)
+        rss_before = rss_mb()
+        traced_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+        await asyncio.sleep(args.duration)
+
+        db_after = METRICS.histograms.get(("db", "add_score"))
+        writes = (db_after.count if db_after else 0) - writes_before
+        result = {
+            "step": step,
+            "channels": len(harness.channels),
+            "live_games": len(cog.games),
+            "live_questions": cog.games.question_count,
+            "messages": harness.sent_messages,
+            "messages_per_second": harness.sent_messages / args.duration,
+            "dropped": harness.dropped,
+            "correct_answers": METRICS.counters.get(("answers", "correct"), 0) - correct_before,
+            "loop_lag": percentiles(harness.lag),
+            "on_message": percentiles(harness.latency),
+            "db_writes_per_second": writes / args.duration,
+            "rss_mb": rss_mb(),
+            "rss_growth_mb": (rss_mb() or 0) - (rss_before or 0),
+        }
+        if traced_before is not None:
+            result["traced_growth_mb"] = (tracemalloc.get_traced_memory()[0] - traced_before) / 2 ** 20
+        steps.append(result)
+        print(f"step {step}: {result['channels']} channels, {result['messages_per_second']:.0f} msg/s, "
+              f"loop lag p99 {result['loop_lag'].get('p99_ms', 0):.1f} ms, "
+              f"on_message p99 {result['on_message'].get('p99_ms', 0):.1f} ms, "
+              f"{result['db_writes_per_second']:.1f} db writes/s, rss {result['rss_mb'] or 0:.0f} MB",
+              file=sys.stderr)
+        if result["loop_lag"].get("p99_ms", 0) > args.max_lag:
+            print(f"loop lag p99 over {args.max_lag} ms, stopping", file=sys.stderr)
+            break
+
+    # end the games before cancelling, start_trivia swallows a cancel that lands while a question is being said
+    harness.running = False
+    for channel in harness.channels:
+        cog.games.end(channel)
+    for task in background + harness.games + list(harness.handlers):
+        task.cancel()
+    await asyncio.gather(*background, *harness.games, *harness.handlers, return_exceptions=True)
+    cog._LoLTrivia__unload()
+
+    return {"meta": {"args": vars(args), "version": util.DATA.version}, "steps": steps}
+
+
+def arguments(prog: str="python -m benchmarks.load") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Synthetic LoLTrivia load")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--channels", type=int, default=500, help="channels playing at the start")
+    parser.add_argument("--ramp", type=int, default=0, help="channels added every step after the first")
+    parser.add_argument("--steps", type=int, default=1, help="number of steps (with --ramp)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per step")
+    parser.add_argument("--rate", type=float, default=200, help="messages per second over every channel")
+    parser.add_argument("--correct", type=float, default=.1, help="share of messages that are right answers")
+    parser.add_argument("--near", type=float, default=.3, help="share of messages that are typos of answers")
+    parser.add_argument("--members", type=int, default=5000, help="number of distinct fake members")
+    parser.add_argument("--guilds", type=int, default=200, help="number of fake guilds the channels are in")
+    parser.add_argument("--questions", type=int, default=15, help="questions per game")
+    parser.add_argument("--game-length", type=float, default=15, help="seconds per question")
+    parser.add_argument("--send-latency", type=float, default=.05, help="simulated seconds per sent message")
+    parser.add_argument("--write-behind", action="store_true", help="queue score writes (db.write_behind)")
+    parser.add_argument("--score-service", help="use the score service at this address (db.service)")
+    parser.add_argument("--max-in-flight", type=int, default=10000, help="drop messages past this many unhandled")
+    parser.add_argument("--max-lag", type=float, default=250, help="stop ramping once loop lag p99 is over this (ms)")
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace python allocations (slower)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0, help="fake static data size")
+    return parser
+
+
+def setup(directory: str, args: argparse.Namespace) -> None:
+    """Points the plugin config at fake static data in `directory`, with the game settings from `args`.
+    The cog keeps its database in data/users.db, run it from `directory` to keep it out of the real one.
+    """
+    configure(directory, args.seed, args.scale)
+    from plugins.lol import config
+    config["trivia"].update({"game_length": args.game_length, "max_games": args.questions})
+    config["db"] = {"write_behind": args.write_behind, "service": args.score_service}
+    config["metrics"] = {}
+    os.makedirs(os.path.join(directory, "data"), exist_ok=True)
+
+
+def main(argv: List[str]=None) -> dict:
+    args = arguments().parse_args(argv)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory(prefix="lol-load-") as directory, contextlib.redirect_stdout(sys.stderr):
+        setup(directory, args)
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            report = loop.run_until_complete(run(args))
+            loop.close()
+        finally:
+            os.chdir(cwd)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+# offline benchmarks, no Riot API key or Discord token needed
+# usage: python -m benchmarks.run [-o results.json] [--compare old.json] [--scale 1.0] [--seed 1] [--calls 2000]
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from typing import *
+
+from . import fixture
+
+Result = Dict[str, float]
+
+
+def measure(func: Callable[..., Any], calls: Sequence[tuple], setup: Callable[[], Any]=None) -> Result:
+    """Time `func` once per argument tuple in `calls`.
+
+    Args:
+        func: The function to time.
+        calls: The arguments of every call.
+        setup: Run (untimed) before every call, e.g. to clear a cache.
+
+    Returns:
+        Result: call count and per call timings in microseconds.
+    """
+    timer = time.perf_counter
+    samples: List[float] = []
+    for args in calls:
+        if setup is not None:
+            setup()
+        start = timer()
+        func(*args)
+        samples.append(timer() - start)
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "mean_us": statistics.mean(samples) * 1e6,
+        "median_us": samples[len(samples) // 2] * 1e6,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * .95))] * 1e6,
+        "min_us": samples[0] * 1e6,
+        "total_ms": sum(samples) * 1e3
+    }
+
+
+def run_sync(coro: Coroutine) -> Any:
+    # the fakes never actually suspend, so a coroutine can be driven to completion without an event loop
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("coroutine suspended")
+
+
+class FakeChannel(object):
+    def __init__(self, id: int=1):
+        self.id: int = id
+        self.sent: int = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+
+def typo(rng: random.Random, name: str) -> str:
+    """`name` with one character dropped, doubled or swapped with the next, like a typo in a query.
+    """
+    if len(name) < 3:
+        return name
+    x = rng.randrange(len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:x] + name[x + 1:]
+    elif kind == 1:
+        return name[:x] + name[x] + name[x:]
+    return name[:x] + name[x + 1] + name[x] + name[x + 2:]
+
+
+def configure(directory: str, seed: int, scale: float) -> None:
+    snapshot = fixture.write(directory, seed, scale)
+    import plugins.lol
+    plugins.lol.config.update({
+        "api_region": "NA",
+        "api_key": "",
+        "static_data": snapshot,
+        "text_cache": os.path.join(directory, "text_cache.json"),
+        "trivia": {"cd": 10, "max_games": 15, "game_length": 15, "points": 15,
+                   "allowed_modes": ["CLASSIC", "ARAM", "KINGPORO", "GAMEMODEX"],
+                   "allowed_maps": ["Summoner's Rift", "Howling Abyss", "Nexus Blitz", "The Twisted Treeline"]}
+    })
+
+
+def bench_load(results: Dict[str, Result], snapshot: str, text_cache: str) -> None:
+    from plugins.lol import static, util
+
+    results["load.snapshot"] = measure(static.StaticData.from_file, [(snapshot,)] * 5)
+    # every derived structure except the text cache (which would just be read back from the first run)
+    def warm() -> None:
+        data = static.StaticData.from_file(snapshot)
+        data._derived[util._text_cache] = {}
+        data.warm()
+    results["load.derived"] = measure(warm, [()] * 5)
+
+    jobs = util._text_jobs(util.DATA)
+    from plugins.lol import text
+    results["load.text_cache.build"] = measure(text.build, [(jobs,)] * 2)
+    results["load.text_cache.read"] = measure(text.load, [(text_cache, util.DATA.version)] * 5)
+
+
+def bench_questions(results: Dict[str, Result], rng: random.Random, calls: int) -> None:
+    from plugins.lol import questions
+
+    for func in questions._questions:
+        results[f"question.{func.__name__}"] = measure(func, [()] * calls)
+
+    pool = questions.QuestionPool(3, questions.QuestionSampler())
+    results["question.pool.get"] = measure(pool.get, [(rng.randrange(100),) for _ in range(calls)])
+    sampler = questions.QuestionSampler()
+
+    def draw(channel: int) -> None:
+        index = sampler.draw_type()
+        sampler.record(channel, index, sampler.draw_entity(channel, index))
+    results["question.sampler.draw"] = measure(draw, [(rng.randrange(100),) for _ in range(calls)])
+
+    # answering: the right answer, a typo of it, and something wrong
+    asked = [questions.get_random_question() for _ in range(calls)]
+    attempts = []
+    for q in asked:
+        answer = rng.choice(q.a)
+        attempts.append((q, rng.choice((answer, typo(rng, answer), "definitely not it"))))
+    results["answer.match"] = measure(lambda q, text: q.matcher.match(text), attempts)
+
+    async def get_score(discord_id: int) -> Optional[int]:
+        return 100
+
+    channel = FakeChannel()
+    author = types.SimpleNamespace(id=1, mention="<@1>")
+
+    def answer(q: questions.Question, text: str) -> None:
+        q.active = True
+        run_sync(q.answer(types.SimpleNamespace(content=text, channel=channel, author=author), get_score))
+    results["answer.question"] = measure(answer, attempts)
+
+
+def bench_lookups(results: Dict[str, Result], rng: random.Random, calls: int) -> None:
+    from plugins.lol import util
+
+    champs = util.DATA.champions
+    items = list(util.DATA.items.values())
+    skins = list(util.SKINS)
+
+    def queries(names: List[str]) -> List[tuple]:
+        return [(rng.choice((name, typo(rng, name), typo(rng, typo(rng, name)))),)
+                for name in (rng.choice(names) for _ in range(calls))]
+
+    champ_queries = queries([champ.name for champ in champs])
+    item_queries = queries([item.name for item in items])
+    skin_queries = queries(skins)
+    everything = queries([champ.name for champ in champs] + [item.name for item in items] + skins)
+
+    # cleared before every call so these time the search itself, not the lru cache in front of it
+    def uncached(index: Callable) -> Callable[[], None]:
+        return lambda: index(util.DATA).search.cache_clear()
+
+    results["lookup.champion"] = measure(util.get_champion_by_name, champ_queries, uncached(util._champion_index))
+    results["lookup.champion.cached"] = measure(util.get_champion_by_name, champ_queries)
+    results["lookup.item"] = measure(util.get_item, item_queries, uncached(util._item_index))
+    results["lookup.skin"] = measure(util.get_skin_by_name, skin_queries, uncached(util._skin_index))
+    results["lookup.entity"] = measure(util.get_entity, everything, uncached(util._entity_index))
+    results["lookup.get_by_name"] = measure(util.get_by_name, [(query, champs) for query, in champ_queries[:200]])
+
+
+def bench_tooltips(results: Dict[str, Result], calls: int) -> None:
+    from plugins.lol import tooltip, util
+
+    spells = [spell for champ in util.DATA.champions for spell in champ.spells] + util.DATA.summoner_spells
+    args = [(spell, spell.tooltip) for spell in spells] * max(1, calls // len(spells))
+    results["tooltip.parse"] = measure(util.parse_tooltip, args)
+    results["tooltip.compile_render"] = measure(lambda spell, tip: tooltip.compile_tooltip(spell, tip).render(spell), args)
+
+
+def bench_embeds(results: Dict[str, Result], rng: random.Random, calls: int) -> None:
+    from plugins.lol import trivia, util
+    from plugins.lol.cache import LRUCache
+
+    champs = util.DATA.champions
+    items = list(util.DATA.items.values())
+    skins = list(util.SKINS.values())
+    pick = lambda things: [(rng.choice(things),) for _ in range(calls)]
+
+    results["embed.champ_info"] = measure(lambda champ: trivia.champ_info(champ, ""), pick(champs))
+    results["embed.spell_info"] = measure(lambda champ: trivia.champ_info(champ, rng.choice("qwerp")), pick(champs))
+    results["embed.item_info"] = measure(trivia.item_info, pick(items))
+    results["embed.skin_info"] = measure(trivia.skin_info, pick(skins))
+    results["embed.summ_info"] = measure(trivia.summ_info, pick(util.DATA.summoner_spells))
+    results["embed.rune_info"] = measure(trivia.rune_info, pick(util.DATA.runes))
+
+    cog = types.SimpleNamespace(embeds=LRUCache(512))
+    info = lambda champ: trivia.LoLTrivia.info_embed(cog, "champion", champ, "").set_footer(text="Match Score: 100")
+    results["embed.info_cached"] = measure(info, pick(champs))
+    results["embed.info_cached"]["hit_rate"] = cog.embeds.hit_rate
+
+
+def bench_db(results: Dict[str, Result], rng: random.Random, directory: str, calls: int) -> None:
+    from plugins.lol import db
+
+    players = [(rng.randrange(10 ** 17, 10 ** 18), f"player{x}#{x:04}") for x in range(500)]
+    guilds = [rng.randrange(10 ** 17, 10 ** 18) for _ in range(20)]
+    writes = [(*rng.choice(players), rng.choice(guilds)) for _ in range(calls)]
+
+    for write_behind in (False, True):
+        name = "write_behind" if write_behind else "immediate"
+        user_db = db.TriviaDB(os.path.join(directory, f"{name}.db"), write_behind=write_behind, flush_size=100)
+        results[f"db.{name}.add_score"] = measure(
+            lambda discord_id, username, guild_id: user_db.add_score(discord_id, 15, username, guild_id),
+            writes[:calls if write_behind else min(calls, 500)])
+        results[f"db.{name}.flush"] = measure(user_db.flush, [()])
+        results[f"db.{name}.get_top"] = measure(user_db.get_top, [(10,)] * 200)
+        results[f"db.{name}.get_top.guild"] = measure(user_db.get_top, [(10, rng.choice(guilds)) for _ in range(200)])
+        results[f"db.{name}.get_rank"] = measure(user_db.get_rank, [(rng.choice(players)[0],) for _ in range(200)])
+        user_db.close()
+
+
+def bench_timers(results: Dict[str, Result], rng: random.Random, calls: int) -> None:
+    # how late questions expire: timers set at random points between ticks of a wheel that's already running.
+    # early is a bug (a question would end before game_length), so that fails the run instead of being reported
+    from plugins.lol.timers import TimerWheel
+
+    async def run() -> List[float]:
+        loop = asyncio.get_event_loop()
+        wheel = TimerWheel(0.25)
+        task = loop.create_task(wheel.run())
+        # keeps the wheel ticking the whole time, like other channels' games would
+        wheel.schedule(3600, asyncio.sleep, 0)
+        lateness: List[float] = []
+
+        async def one(delay: float) -> None:
+            await asyncio.sleep(rng.uniform(0, 2))
+            start = loop.time()
+            await wheel.schedule(delay, asyncio.sleep, 0).done
+            lateness.append(loop.time() - start - delay)
+
+        await asyncio.gather(*(one(rng.choice((0.25, 0.5, 1.0, 1.3))) for _ in range(calls)))
+        task.cancel()
+        wheel.clear()
+        return lateness
+
+    loop = asyncio.new_event_loop()
+    try:
+        lateness = sorted(loop.run_until_complete(run()))
+    finally:
+        loop.close()
+    if lateness[0] < 0:
+        raise AssertionError(f"timer fired {-lateness[0] * 1000:.1f} ms early")
+    results["timers.lateness"] = {
+        "calls": len(lateness),
+        "mean_us": statistics.mean(lateness) * 1e6,
+        "median_us": lateness[len(lateness) // 2] * 1e6,
+        "p95_us": lateness[min(len(lateness) - 1, int(len(lateness) * .95))] * 1e6,
+        "min_us": lateness[0] * 1e6,
+        "total_ms": sum(lateness) * 1e3
+    }
+
+
+def compare(old: Dict[str, Result], new: Dict[str, Result]) -> str:
+    lines = [f"{'benchmark':40} {'old (us)':>12} {'new (us)':>12} {'change':>8}"]
+    for name in sorted(set(old) | set(new)):
+        before, after = old.get(name, {}).get("median_us"), new.get(name, {}).get("median_us")
+        if before is None or after is None:
+            lines.append(f"{name:40} {before or '-':>12} {after or '-':>12}")
+            continue
+        lines.append(f"{name:40} {before:12.2f} {after:12.2f} {(after / before - 1) * 100 if before else 0:+7.1f}%")
+    return '\n'.join(lines)
+
+
+def main(argv: List[str]=None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Offline LoLTrivia benchmarks")
+    parser.add_argument("-o", "--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against (printed to stderr)")
+    parser.add_argument("--seed", type=int, default=1, help="fixture and query seed")
+    parser.add_argument("--scale", type=float, default=1.0, help="fixture size, 1.0 is about the real data")
+    parser.add_argument("--calls", type=int, default=2000, help="calls per benchmark")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results: Dict[str, Result] = {}
+    # anything the bot prints goes to stderr, stdout is for the results
+    with tempfile.TemporaryDirectory(prefix="lol-bench-") as directory, contextlib.redirect_stdout(sys.stderr):
+        configure(directory, args.seed, args.scale)
+        start = time.perf_counter()
+        from plugins.lol import util
+        util.swap(util.load())
+        results["load.startup"] = {"calls": 1, "total_ms": (time.perf_counter() - start) * 1e3}
+
+        # seed the module level random too, the generators use it
+        random.seed(args.seed)
+        bench_load(results, util.config["static_data"], util.config["text_cache"])
+        bench_questions(results, rng, args.calls)
+        bench_lookups(results, rng, args.calls)
+        bench_tooltips(results, args.calls)
+        bench_embeds(results, rng, args.calls)
+        bench_db(results, rng, directory, args.calls)
+        bench_timers(results, rng, min(args.calls, 500))
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    report = {
+        "meta": {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": args.seed, "scale": args.scale,
+                 "calls": args.calls},
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f)["results"], results), file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
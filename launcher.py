@@ -0,0 +1,334 @@
+#!python3
+# runs the bot as several processes, each owning a contiguous range of shards
+# the supervisor loads the static data once and forks the workers afterwards, so they share it copy-on-write
+# instead of each holding its own copy. workers report health over a queue every few seconds, crashed ones are
+# restarted with a backoff.
+#
+# python launcher.py --shards 8 --workers 4
+# python launcher.py --fake --workers 4 --run-for 60 -- --channels 500 --rate 200
+#   (no Discord connection: each worker plays against fake guilds from its shards, see benchmarks/load.py)
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import queue as queues
+import random
+import signal
+import sys
+import tempfile
+import time
+from typing import *
+
+from discord.ext import commands
+
+import plugins
+import run
+
+logger = logging.getLogger('LoLTrivia.launcher')
+
+LOG_FORMAT = '%(asctime)s::%(processName)s::%(name)s::%(levelname)s::%(message)s'
+
+
+def shard_ranges(shard_count: int, workers: int) -> List[List[int]]:
+    """Splits shards 0..shard_count-1 into `workers` contiguous ranges, as evenly as possible.
+    """
+    size, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for x in range(workers):
+        end = start + size + (x < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def shard_guild_ids(shard_ids: List[int], shard_count: int, per_shard: int) -> List[int]:
+    """Made up guild ids that Discord would route to `shard_ids` (shard = (guild_id >> 22) % shard_count).
+    """
+    return [(shard + shard_count * (k + 1)) << 22 for shard in shard_ids for k in range(per_shard)]
+
+
+def prepare(config: dict, fake_args: Optional[argparse.Namespace], directory: Optional[str]) -> None:
+    """Loads the plugins' data. Done by the supervisor before forking, workers that were spawned
+    instead (no fork on this platform) do it again themselves.
+    """
+    if plugins.preloaded(config):
+        return
+    if fake_args is not None:
+        from benchmarks import load
+        load.setup(directory, fake_args)
+        config = {"plugins": ["lol"], "plugins.lol": dict(plugins.lol.config)}
+    plugins.preload_plugins(config)
+
+
+async def report_health(queue: multiprocessing.Queue, index: int, shard_ids: List[int], interval: float,
+                        stats: Callable[[], dict]) -> None:
+    """Puts this worker's health on `queue` every `interval` seconds.
+
+    Args:
+        queue: The supervisor's health queue.
+        index: The worker number.
+        shard_ids: The shards this worker runs.
+        interval: Seconds between reports.
+        stats: Returns the bot specific part of the report.
+    """
+    from plugins.lol.metrics import METRICS, rss_mb
+    loop = asyncio.get_event_loop()
+    started = time.time()
+    while True:
+        # worst event loop lag since the last report, probed every 100ms
+        worst = 0.0
+        end = loop.time() + interval
+        while loop.time() < end:
+            before = loop.time()
+            await asyncio.sleep(.1)
+            worst = max(worst, loop.time() - before - .1)
+        answers = METRICS.histograms.get(("on_message", "answer_check"))
+        queue.put({
+            "worker": index, "pid": os.getpid(), "shards": shard_ids, "time": time.time(),
+            "uptime": time.time() - started, "loop_lag_ms": worst * 1000, "rss_mb": rss_mb(),
+            "shared_mb": shared_mb(),
+            "on_message_p99_ms": answers.quantile(.99) * 1000 if answers else None,
+            "correct_answers": METRICS.counters.get(("answers", "correct"), 0),
+            **stats()
+        })
+
+
+def shared_mb() -> Optional[float]:
+    """How much of this process' resident memory is shared with other processes (e.g. the static data inherited
+    from the supervisor), None where /proc/self/smaps_rollup isn't available.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line[0].isdigit())
+        return sum(int(fields[k].split()[0]) for k in ("Shared_Clean", "Shared_Dirty")) / 2 ** 10
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def cog_stats(cog: Any) -> dict:
+    return {"games": len(cog.games), "questions": cog.games.question_count} if cog else {}
+
+
+async def fake_gateway(queue: multiprocessing.Queue, index: int, shard_ids: List[int], shard_count: int,
+                       interval: float, args: argparse.Namespace, crash_after: float) -> None:
+    from benchmarks.load import FakeClient, Harness
+    from plugins.lol.trivia import LoLTrivia
+
+    cog = LoLTrivia(FakeClient(asyncio.get_event_loop()))
+    await cog.ready.wait()
+    guild_ids = shard_guild_ids(shard_ids, shard_count, max(1, args.guilds // shard_count))
+    harness = Harness(cog, args, random.Random(args.seed + index), guild_ids)
+    harness.add_channels(args.channels)
+    asyncio.ensure_future(harness.traffic())
+    if crash_after:
+        asyncio.get_event_loop().call_later(crash_after, os._exit, 1)
+
+    stats = lambda: {"guilds": len(guild_ids), "channels": len(harness.channels), "messages": harness.sent_messages,
+                     "dropped": harness.dropped, **cog_stats(cog)}
+    await report_health(queue, index, shard_ids, interval, stats)
+
+
+def worker(index: int, shard_ids: List[int], shard_count: int, config: dict, queue: multiprocessing.Queue,
+           interval: float, fake_args: Optional[argparse.Namespace], directory: Optional[str],
+           crash_after: float) -> None:
+    # ctrl+c goes to the whole process group, leave stopping the workers to the supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # and don't keep the supervisor's SIGTERM handler from the fork
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
+    prepare(config, fake_args, directory)
+
+    if fake_args is not None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(fake_gateway(queue, index, shard_ids, shard_count, interval, fake_args, crash_after))
+        return
+
+    client = run.create_bot(config, commands.AutoShardedBot, shard_ids=shard_ids, shard_count=shard_count)
+    plugins.load_plugins(client, config)
+    stats = lambda: {"guilds": len(client.guilds), "latency_ms": client.latency * 1000,
+                     **cog_stats(client.get_cog("LoLTrivia"))}
+    client.loop.create_task(report_health(queue, index, shard_ids, interval, stats))
+    logger.info(f"Logging in shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}...")
+    client.run(config["bot"]["discord_token"])
+
+
+class Worker(object):
+    __slots__ = ("index", "shard_ids", "process", "started", "restarts", "failures", "restart_at", "health")
+
+    def __init__(self, index: int, shard_ids: List[int]):
+        self.index: int = index
+        self.shard_ids: List[int] = shard_ids
+        self.process: Optional[multiprocessing.Process] = None
+        self.started: float = 0.0
+        self.restarts: int = 0
+        # crashes in a row, for the backoff. reset once it's stayed up a while
+        self.failures: int = 0
+        self.restart_at: Optional[float] = None
+        self.health: dict = {}
+
+
+class Supervisor(object):
+    """Starts a process per shard range, restarts the ones that die and keeps their latest health reports.
+    """
+    def __init__(self, config: dict, shard_count: int, workers: int, *, interval: float=10,
+                 health_file: str=None, fake_args: argparse.Namespace=None, directory: str=None,
+                 crash_after: float=0):
+        self.config: dict = config
+        self.shard_count: int = shard_count
+        self.interval: float = interval
+        self.health_file: Optional[str] = health_file
+        self.fake_args: Optional[argparse.Namespace] = fake_args
+        self.directory: Optional[str] = directory
+        self.crash_after: float = crash_after
+        self.workers: List[Worker] = [Worker(x, shards) for x, shards in
+                                      enumerate(shard_ranges(shard_count, workers))]
+        try:
+            self.context = multiprocessing.get_context("fork")
+        except ValueError:
+            logger.warning("Can't fork here, every worker will load its own copy of the static data")
+            self.context = multiprocessing.get_context("spawn")
+        self.queue: multiprocessing.Queue = self.context.Queue()
+        self.stopping: bool = False
+
+    def start(self, w: Worker) -> None:
+        crash_after = self.crash_after if not w.restarts else 0
+        w.process = self.context.Process(
+            target=worker, name=f"shards-{w.shard_ids[0]}-{w.shard_ids[-1]}", daemon=True,
+            args=(w.index, w.shard_ids, self.shard_count, self.config, self.queue, self.interval, self.fake_args,
+                  self.directory, crash_after))
+        w.process.start()
+        w.started = time.monotonic()
+        w.restart_at = None
+        logger.info(f"Started worker {w.index} (shards {w.shard_ids}) as pid {w.process.pid}")
+
+    def check(self, w: Worker) -> None:
+        if w.process.is_alive():
+            if w.failures and time.monotonic() - w.started > 60:
+                w.failures = 0
+            return
+        if w.restart_at is None:
+            w.failures += 1
+            delay = min(60, 2 ** (w.failures - 1))
+            w.restart_at = time.monotonic() + delay
+            logger.error(f"Worker {w.index} (shards {w.shard_ids}) exited with {w.process.exitcode}, "
+                         f"restarting in {delay}s")
+        elif time.monotonic() >= w.restart_at:
+            w.restarts += 1
+            self.start(w)
+
+    def report(self) -> dict:
+        return {"time": time.time(), "shard_count": self.shard_count, "workers": [
+            {"index": w.index, "shards": w.shard_ids, "alive": w.process.is_alive(), "pid": w.process.pid,
+             "restarts": w.restarts, **{k: v for k, v in w.health.items() if k not in ("worker", "shards", "pid")}}
+            for w in self.workers]}
+
+    def write_report(self) -> None:
+        report = self.report()
+        for w in report["workers"]:
+            logger.info(f"worker {w['index']}: {'up' if w['alive'] else 'DOWN'}, restarts {w['restarts']}, "
+                        f"games {w.get('games', '?')}, loop lag {w.get('loop_lag_ms', 0):.1f} ms, "
+                        f"rss {w.get('rss_mb') or 0:.0f} MB ({w.get('shared_mb') or 0:.0f} MB shared)")
+        if self.health_file:
+            with open(f"{self.health_file}.tmp", "w") as f:
+                json.dump(report, f, indent=2)
+            os.replace(f"{self.health_file}.tmp", self.health_file)
+
+    def stop(self, *args) -> None:
+        self.stopping = True
+
+    def run(self, run_for: float=0) -> dict:
+        """Starts every worker and supervises them until stopped (SIGTERM/ctrl+c) or `run_for` seconds are up.
+
+        Returns:
+            dict: the last health report.
+        """
+        prepare(self.config, self.fake_args, self.directory)
+        # keep the loaded data out of the collector's way so it doesn't touch (and un-share) those pages
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+        signal.signal(signal.SIGTERM, self.stop)
+        for w in self.workers:
+            self.start(w)
+
+        end = time.monotonic() + run_for if run_for else None
+        next_report = time.monotonic() + self.interval
+        try:
+            while not self.stopping and (end is None or time.monotonic() < end):
+                try:
+                    health = self.queue.get(timeout=1)
+                    self.workers[health["worker"]].health = health
+                except queues.Empty:
+                    pass
+                for w in self.workers:
+                    self.check(w)
+                if time.monotonic() >= next_report:
+                    next_report += self.interval
+                    self.write_report()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            report = self.report()
+            for w in self.workers:
+                w.process.terminate()
+            for w in self.workers:
+                w.process.join(10)
+                if w.process.is_alive():
+                    w.process.kill()
+        return report
+
+
+def main(argv: List[str]=None) -> dict:
+    parser = argparse.ArgumentParser(prog="launcher.py", description="Runs LoLTrivia as several shard processes",
+                                     epilog="arguments after -- go to the fake gateway (see benchmarks/load.py)")
+    parser.add_argument("--shards", type=int, help="total number of shards (default: launcher.shards or workers)")
+    parser.add_argument("--workers", type=int, help="number of processes (default: launcher.workers or CPU count)")
+    parser.add_argument("--health-file", help="write the latest health of every worker here as JSON")
+    parser.add_argument("--interval", type=float, help="seconds between health reports")
+    parser.add_argument("--fake", action="store_true", help="play against a fake gateway instead of Discord")
+    parser.add_argument("--run-for", type=float, default=0, help="stop after this many seconds (0: run until stopped)")
+    parser.add_argument("--crash-after", type=float, default=0,
+                        help="(fake) kill every worker once after this many seconds to try out restarts")
+    argv = sys.argv[1:] if argv is None else argv
+    fake_argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    args = parser.parse_args(argv[:argv.index("--")] if "--" in argv else argv)
+
+    logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
+    config: dict = run.load_config() if not args.fake or os.path.exists("config.json") else {"plugins": ["lol"]}
+    launcher_config: dict = config.get("launcher", {})
+    workers = args.workers or launcher_config.get("workers") or os.cpu_count() or 1
+    shard_count = max(workers, args.shards or launcher_config.get("shards") or workers)
+    interval = args.interval or launcher_config.get("health_interval", 10)
+    health_file = args.health_file or launcher_config.get("health_file")
+
+    # without the score service every worker would have its own leaderboard, and scores would depend on the shard
+    db_config: dict = config.get("plugins.lol", {}).get("db", {})
+    if workers > 1 and not args.fake and not db_config.get("service"):
+        parser.error("more than one worker needs the score service, set db.service (see python -m plugins.lol.scores)")
+
+    if not args.fake:
+        return Supervisor(config, shard_count, workers, interval=interval, health_file=health_file).run(args.run_for)
+
+    from benchmarks import load
+    fake_args = load.arguments("launcher.py --fake ... --").parse_args(fake_argv)
+    if workers > 1 and not fake_args.score_service:
+        logger.warning("Without --score-service every fake worker keeps its own scores")
+    with tempfile.TemporaryDirectory(prefix="lol-shards-") as directory:
+        if health_file:
+            health_file = os.path.abspath(health_file)
+        # the workers' score database goes in the temporary directory too
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            return Supervisor(config, shard_count, workers, interval=interval, health_file=health_file,
+                              fake_args=fake_args, directory=directory,
+                              crash_after=args.crash_after).run(args.run_for)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import importlib
+from typing import *
 
 from discord.ext import commands
 
+# plugins whose preload has run in this process (or the one it was forked from)
+_preloaded: Set[str] = set()
+
 
 def load_plugins(bot: commands.Bot, config: dict):
     modules = []
@@ -12,3 +16,23 @@ def load_plugins(bot: commands.Bot, config: dict):
 
     for module in modules:
         module.init(bot, config)
+
+
+def preload_plugins(config: dict):
+    """Imports the plugins and lets them load their data ahead of `load_plugins`,
+    so processes forked afterwards share it.
+    """
+    for plugin in config["plugins"]:
+        if plugin in _preloaded:
+            continue
+        module = importlib.import_module(f"plugins.{plugin}")
+        globals()[plugin] = module
+        if hasattr(module, "preload"):
+            module.preload(config)
+        _preloaded.add(plugin)
+
+
+def preloaded(config: dict) -> bool:
+    """Whether every plugin in `config` has been preloaded already.
+    """
+    return all(plugin in _preloaded for plugin in config["plugins"])
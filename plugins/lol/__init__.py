@@ -1,6 +1,6 @@
 from discord.ext import commands
 
-import cassiopeia as riotapi
+from .metrics import STARTUP
 
 config: dict = {}
 
@@ -8,8 +8,18 @@ config: dict = {}
 def init(bot: commands.Bot, cfg: dict):
     config.update(cfg[__name__])
 
-    riotapi.set_default_region(config["api_region"])
-    riotapi.set_riot_api_key(config["api_key"])
+    # only registers the cog, the static data gets loaded after logging in (see LoLTrivia.warm_up).
+    # it comes from the compiled snapshot (see static.py), the Riot API is only hit to build it.
+    with STARTUP.phase("import"):
+        from .trivia import LoLTrivia
+    with STARTUP.phase("register"):
+        bot.add_cog(LoLTrivia(bot))
 
-    from .trivia import LoLTrivia
-    bot.add_cog(LoLTrivia(bot))
+
+def preload(cfg: dict):
+    config.update(cfg[__name__])
+
+    # loads the static data and everything derived from it now, LoLTrivia's warm-up then finds it done
+    with STARTUP.phase("import"):
+        from . import trivia, util
+    util.swap(util.load())
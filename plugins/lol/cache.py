@@ -0,0 +1,62 @@
+# small LRU cache that keeps count of how well it's doing
+from collections import OrderedDict
+from typing import *
+
+from .metrics import METRICS
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class LRUCache(Generic[K, V]):
+    """Keeps the `size` most recently used values, counting hits and misses.
+    Named caches count them in the metrics too, as cache_hits/cache_misses.
+    """
+    def __init__(self, size: int=512, name: str=None):
+        self.size: int = size
+        self.name: Optional[str] = name
+        self.hits: int = 0
+        self.misses: int = 0
+        self._values: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._values
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: K, build: Callable[[], V]) -> V:
+        """Gets the value for `key`, building (and keeping) it if it isn't cached.
+
+        Args:
+            key: The key of the value.
+            build: Function building the value on a miss.
+
+        Returns:
+            V: the value.
+        """
+        try:
+            value = self._values[key]
+        except KeyError:
+            self.misses += 1
+            if self.name:
+                METRICS.inc("cache_misses", self.name)
+            value = build()
+            if self.size > 0:
+                self._values[key] = value
+                if len(self._values) > self.size:
+                    self._values.popitem(last=False)
+        else:
+            self.hits += 1
+            if self.name:
+                METRICS.inc("cache_hits", self.name)
+            self._values.move_to_end(key)
+        return value
+
+    def clear(self) -> None:
+        self._values.clear()
@@ -1,57 +1,334 @@
 # simple sqlite db for holding scores
 # perhaps will look into using sqlalchemy
+import asyncio
+import atexit
+import functools
 import sqlite3
-from typing import Optional, List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple, Dict, Any, Callable
+
+from .leaderboard import Leaderboard
+from .metrics import METRICS
+
+
+SCHEMA_VERSION = 2
 
 
 class TriviaDB(object):
-    def __init__(self, file: str):
-        self.conn: sqlite3.Connection = sqlite3.connect(file)
+    def __init__(self, file: str, *, write_behind: bool=False, flush_size: int=100, flush_interval: float=5.0):
+        """Open (or create) the score database.
+
+        Args:
+            file: Path to the sqlite database.
+            write_behind: Queue score increments in memory and write them in one transaction every so often,
+                instead of committing on every answer.
+            flush_size: (write_behind) Number of queued increments that triggers a write.
+            flush_interval: (write_behind) Seconds after which queued increments are written.
+        """
+        # not bound to the creating thread so AsyncTriviaDB's worker (and the atexit flush) can use it.
+        # callers must still only use it from one thread at a time.
+        self.conn: sqlite3.Connection = sqlite3.connect(file, check_same_thread=False)
         self.db: sqlite3.Cursor = self.conn.cursor()
+        # WAL lets readers go on while a write is in progress and needs fewer fsyncs per commit
+        self.db.execute("PRAGMA journal_mode=WAL;")
+        # players holds the global score (the sum of a player's guild scores) and the name
         self.db.execute(
             "CREATE TABLE IF NOT EXISTS players(discord_id INTEGER PRIMARY KEY, score INTEGER, username TEXT)"
         )
+        self.migrate()
+
+        # every global score lives in memory too, reads never have to hit the disk (or sort the table)
+        self.leaderboard: Leaderboard = Leaderboard()
+        for discord_id, score, username in self.db.execute("SELECT discord_id, score, username FROM players;"):
+            self.leaderboard.update(discord_id, score or 0, username)
+        # last score service request written for each of its clients, see flush
+        self.client_seqs: Dict[str, int] = dict(self.db.execute("SELECT client, seq FROM score_clients;"))
+
+        self.write_behind: bool = write_behind
+        self.flush_size: int = flush_size
+        self.flush_interval: float = flush_interval
+        # discord_id: [points, username]
+        self._pending: Dict[int, list] = {}
+        # (guild_id, discord_id): points
+        self._pending_guilds: Dict[Tuple[int, int], int] = {}
+        self._pending_count: int = 0
+        self._last_flush: float = time.monotonic()
+        if write_behind:
+            atexit.register(self.flush)
+
+    def migrate(self) -> None:
+        """Brings an older database up to SCHEMA_VERSION, each step in one transaction.
 
-    def get_score(self, discord_id: int) -> Optional[int]:
+        Returns:
+            None
+        """
+        version: int = self.db.execute("PRAGMA user_version;").fetchone()[0]
+        if version < 1:
+            # per-guild scores, the index keeps a guild's top/rank queries a range scan even with millions of rows
+            with self.conn:
+                self.db.execute("CREATE TABLE IF NOT EXISTS guild_scores(guild_id INTEGER, discord_id INTEGER, "
+                                "score INTEGER, PRIMARY KEY(guild_id, discord_id)) WITHOUT ROWID;")
+                self.db.execute("CREATE INDEX IF NOT EXISTS guild_scores_by_score ON guild_scores(guild_id, score DESC);")
+                # there's no telling where older scores came from, file them under guild 0 so the totals still add up
+                self.db.execute("INSERT OR IGNORE INTO guild_scores SELECT 0, discord_id, score FROM players;")
+                self.db.execute("PRAGMA user_version = 1;")
+        if version < 2:
+            with self.conn:
+                self.db.execute("CREATE TABLE IF NOT EXISTS score_clients(client TEXT PRIMARY KEY, seq INTEGER);")
+                self.db.execute("PRAGMA user_version = 2;")
+
+    def get_score(self, discord_id: int, guild_id: int=None) -> Optional[int]:
         """Gets a player's score.
 
         Args:
             discord_id: The user id of the Discord member.
+            guild_id: Only count points scored in this guild. Global score if not given.
 
         Returns:
             Optional[int]: Score (int) if user exists, None otherwise.
         """
-        self.db.execute("SELECT score FROM players WHERE discord_id=?;", (int(discord_id),))
+        if guild_id is None:
+            return self.leaderboard.score(int(discord_id))
+
+        self.db.execute("SELECT score FROM guild_scores WHERE guild_id=? AND discord_id=?;",
+                        (int(guild_id), int(discord_id)))
         user: Tuple[int] = self.db.fetchone()
+        pending: Optional[int] = self._pending_guilds.get((int(guild_id), int(discord_id)))
+        if pending:
+            return (user[0] if user else 0) + pending
         return user[0] if user else None
 
-    def add_score(self, discord_id: int, score: int, username: str=None) -> None:
+    def get_rank(self, discord_id: int, guild_id: int=None) -> Optional[Tuple[int, int]]:
+        """Gets a player's position on the scoreboard.
+
+        Args:
+            discord_id: The user id of the Discord member.
+            guild_id: Rank among players of this guild. Global rank if not given.
+
+        Returns:
+            Optional[Tuple[int, int]]: (rank, score) if user exists, None otherwise. Rank starts at 1.
+        """
+        if guild_id is None:
+            rank = self.leaderboard.rank(int(discord_id))
+            return (rank, self.leaderboard.score(int(discord_id))) if rank else None
+
+        discord_id, guild_id = int(discord_id), int(guild_id)
+        score = self.get_score(discord_id, guild_id)
+        if score is None:
+            return None
+        # same tie break as the leaderboard
+        beats = lambda other_id, other_score: other_score > score or (other_score == score and other_id < discord_id)
+        self.db.execute("SELECT COUNT(*) FROM guild_scores WHERE guild_id=? AND "
+                        "(score > ? OR (score = ? AND discord_id < ?));",
+                        (guild_id, score, score, discord_id))
+        rank = self.db.fetchone()[0] + 1
+        # the count went by what's committed, correct it for players with queued points
+        for other_id, (committed, pending) in self._pending_guild_scores(guild_id).items():
+            if other_id != discord_id:
+                rank += beats(other_id, pending) - (committed is not None and beats(other_id, committed))
+        return rank, score
+
+    def _pending_guild_scores(self, guild_id: int) -> Dict[int, Tuple[Optional[int], int]]:
+        # (committed, including queued points) score of every player in the guild with points queued.
+        # there's at most flush_size of them, so a lookup each is fine
+        scores = {}
+        for (pending_guild, discord_id), points in self._pending_guilds.items():
+            if pending_guild != guild_id:
+                continue
+            self.db.execute("SELECT score FROM guild_scores WHERE guild_id=? AND discord_id=?;",
+                            (guild_id, discord_id))
+            row = self.db.fetchone()
+            scores[discord_id] = (row[0] if row else None, (row[0] if row else 0) + points)
+        return scores
+
+    def cache_name(self, discord_id: int, username: str) -> None:
+        """Remembers a name looked up for a player without one, so get_top doesn't need it looked up again.
+
+        Args:
+            discord_id: The user id of the Discord member.
+            username: The name#discriminator of the member.
+
+        Returns:
+            None
+        """
+        self.leaderboard.names.setdefault(int(discord_id), username)
+
+    def add_score(self, discord_id: int, score: int, username: str=None, guild_id: int=None) -> None:
         """Adds to a player's score
 
         Args:
             discord_id: The user id of the Discord member.
             score: The number of points to add.
             username: The name#discriminator of the member.
+            guild_id: The guild the points were scored in, if any.
+
+        Returns:
+            None
+        """
+        discord_id = int(discord_id)
+        total: int = (self.get_score(discord_id) or 0) + score
+
+        players: Dict[int, list] = self._pending if self.write_behind else {}
+        guilds: Dict[Tuple[int, int], int] = self._pending_guilds if self.write_behind else {}
+
+        pending = players.setdefault(discord_id, [0, None])
+        pending[0] += score
+        pending[1] = username or pending[1]
+        if guild_id is not None:
+            guilds[int(guild_id), discord_id] = guilds.get((int(guild_id), discord_id), 0) + score
+
+        if not self.write_behind:
+            self._write(players, guilds)
+            # only once it's in the database, a failed write mustn't leave the leaderboard ahead of it
+            self.leaderboard.update(discord_id, total, username)
+            return
+
+        # queued increments are kept until they're written, so the leaderboard can go ahead
+        self.leaderboard.update(discord_id, total, username)
+        self._pending_count += 1
+        if self._pending_count >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self, client_seqs: Dict[str, int]=None) -> None:
+        """Writes all queued score increments in a single transaction (write_behind mode).
+
+        Args:
+            client_seqs: (score service) Last request of each client the increments include, written in the same
+                transaction so a restarted service knows which re-sent ones it has counted already.
+
+        Returns:
+            None
+        """
+        self._last_flush = time.monotonic()
+        if not self._pending and not client_seqs:
+            return
+
+        players, self._pending = self._pending, {}
+        guilds, self._pending_guilds = self._pending_guilds, {}
+        self._pending_count = 0
+        try:
+            self._write(players, guilds, client_seqs)
+        except sqlite3.Error:
+            # put them back so the next flush tries again
+            for discord_id, (score, username) in players.items():
+                queued = self._pending.setdefault(discord_id, [0, None])
+                queued[0] += score
+                queued[1] = queued[1] or username
+            for key, score in guilds.items():
+                self._pending_guilds[key] = self._pending_guilds.get(key, 0) + score
+            raise
+
+    def _write(self, players: Dict[int, list], guilds: Dict[Tuple[int, int], int],
+               client_seqs: Dict[str, int]=None) -> None:
+        with self.conn:
+            self.db.executemany("INSERT OR IGNORE INTO players VALUES(?, 0, ?);",
+                                [(discord_id, username) for discord_id, (_, username) in players.items()])
+            self.db.executemany("UPDATE players SET score = score + ?, username = COALESCE(?, username) "
+                                "WHERE discord_id=?;",
+                                [(score, username, discord_id) for discord_id, (score, username) in players.items()])
+            self.db.executemany("INSERT OR IGNORE INTO guild_scores VALUES(?, ?, 0);", list(guilds))
+            self.db.executemany("UPDATE guild_scores SET score = score + ? WHERE guild_id=? AND discord_id=?;",
+                                [(score, guild_id, discord_id) for (guild_id, discord_id), score in guilds.items()])
+            if client_seqs:
+                self.db.executemany("INSERT OR REPLACE INTO score_clients VALUES(?, ?);", list(client_seqs.items()))
+        if client_seqs:
+            self.client_seqs.update(client_seqs)
+
+    def close(self) -> None:
+        """Flushes any queued increments and closes the database.
 
         Returns:
             None
         """
-        if not self.get_score(discord_id):
-            self.db.execute("INSERT INTO players VALUES(?, ?, ?);", (int(discord_id), score, username))
-        else:
-            self.db.execute("UPDATE players SET score = score + ? WHERE discord_id=?", (score, discord_id))
-            if username:
-                self.db.execute("UPDATE players SET username = ? WHERE discord_id=?", (username, discord_id))
-        self.conn.commit()
+        self.flush()
+        if self.write_behind:
+            atexit.unregister(self.flush)
+        self.conn.close()
 
-    def get_top(self, num: int=10) -> List[Tuple[int, int, str]]:
+    def get_top(self, num: int=10, guild_id: int=None) -> List[Tuple[int, int, str]]:
         """Gets the top `num` players.
 
         Args:
             num: Number of top players to retrieve.
+            guild_id: Only count points scored in this guild. Global scoreboard if not given.
 
         Returns:
             List[Tuple[int, int, str]]: an ordered list (descending) of tuples of (discord_id, score, username).
         """
-        self.db.execute("SELECT discord_id, score, username FROM players ORDER BY score DESC LIMIT ?;", (num,))
-        return self.db.fetchall()
+        if guild_id is None:
+            return self.leaderboard.top(num)
+
+        # the committed top, with enough extra rows that players pushed down by queued points are still in it
+        pending = {discord_id: score for discord_id, (_, score) in self._pending_guild_scores(int(guild_id)).items()}
+        self.db.execute("SELECT discord_id, score FROM guild_scores WHERE guild_id=? "
+                        "ORDER BY score DESC, discord_id LIMIT ?;", (int(guild_id), num + len(pending)))
+        scores = dict(self.db.fetchall())
+        scores.update(pending)
+        top = sorted(scores.items(), key=lambda player: (-player[1], player[0]))[:num]
+        return [(discord_id, score, self.leaderboard.names.get(discord_id)) for discord_id, score in top]
+
+
+class AsyncTriviaDB(object):
+    """Same interface as TriviaDB, but awaitable. Every query runs on a dedicated worker thread,
+    so a slow disk never blocks the event loop.
+    """
+    def __init__(self, file: str, **kwargs):
+        """Open (or create) the score database on the worker thread.
+
+        Args:
+            file: Path to the sqlite database.
+            **kwargs: Passed on to TriviaDB.
+        """
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="TriviaDB")
+        self.sync: TriviaDB = self.executor.submit(TriviaDB, file, **kwargs).result()
+
+    @property
+    def write_behind(self) -> bool:
+        return self.sync.write_behind
+
+    @property
+    def flush_interval(self) -> float:
+        return self.sync.flush_interval
+
+    async def _run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        # timed from the loop's side, so waiting behind other queries counts too
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_event_loop().run_in_executor(self.executor,
+                                                                  functools.partial(func, *args, **kwargs))
+        finally:
+            METRICS.observe("db", func.__name__, time.perf_counter() - start)
+
+    async def get_score(self, discord_id: int, guild_id: int=None) -> Optional[int]:
+        """See TriviaDB.get_score"""
+        return await self._run(self.sync.get_score, discord_id, guild_id)
+
+    async def add_score(self, discord_id: int, score: int, username: str=None, guild_id: int=None) -> None:
+        """See TriviaDB.add_score"""
+        return await self._run(self.sync.add_score, discord_id, score, username, guild_id)
+
+    async def get_top(self, num: int=10, guild_id: int=None) -> List[Tuple[int, int, str]]:
+        """See TriviaDB.get_top"""
+        return await self._run(self.sync.get_top, num, guild_id)
+
+    async def get_rank(self, discord_id: int, guild_id: int=None) -> Optional[Tuple[int, int]]:
+        """See TriviaDB.get_rank"""
+        return await self._run(self.sync.get_rank, discord_id, guild_id)
+
+    async def cache_name(self, discord_id: int, username: str) -> None:
+        """See TriviaDB.cache_name"""
+        return await self._run(self.sync.cache_name, discord_id, username)
+
+    async def flush(self, client_seqs: Dict[str, int]=None) -> None:
+        """See TriviaDB.flush"""
+        return await self._run(self.sync.flush, client_seqs)
+
+    def close(self) -> None:
+        """Flushes, closes the database and stops the worker thread. Blocks until done.
+
+        Returns:
+            None
+        """
+        self.executor.submit(self.sync.close).result()
+        self.executor.shutdown()
@@ -0,0 +1,91 @@
+# registry of channels with a game going on
+# only channels with a live game are in here, so checking a channel that isn't playing is a dict miss
+# and nothing sticks around after a game ends.
+from contextlib import contextmanager
+from typing import *
+
+import discord
+
+from .questions import Question
+from .timers import Timer
+
+
+class Game(object):
+    """A game of trivia in one channel.
+    """
+    __slots__ = ("running", "questions", "hosts")
+
+    def __init__(self):
+        # set to False to stop the game after the current question
+        self.running: bool = True
+        # number of GameRegistry.play blocks sharing it, the last one out ends it
+        self.hosts: int = 0
+        # questions that haven't been answered/expired yet, and the timer expiring them
+        self.questions: Dict[Question, Timer] = {}
+
+
+class GameRegistry(object):
+    """The games currently being played, by channel.
+    """
+    def __init__(self):
+        self._games: Dict[discord.abc.Messageable, Game] = {}
+
+    def __contains__(self, channel: discord.abc.Messageable) -> bool:
+        return channel in self._games
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def get(self, channel: discord.abc.Messageable) -> Optional[Game]:
+        return self._games.get(channel)
+
+    @property
+    def question_count(self) -> int:
+        """Number of questions waiting for an answer, over every channel.
+        """
+        return sum(len(game.questions) for game in self._games.values())
+
+    @contextmanager
+    def play(self, channel: discord.abc.Messageable) -> Iterator[Game]:
+        """Registers a game in `channel` for the duration of the with block.
+        If one is already going on it's shared, and ends when the last block sharing it exits.
+
+        Args:
+            channel: The channel to play in.
+
+        Yields:
+            Game: the channel's game.
+        """
+        game = self._games.get(channel)
+        if game is None:
+            game = self._games[channel] = Game()
+        game.hosts += 1
+        try:
+            yield game
+        finally:
+            game.hosts -= 1
+            if not game.hosts:
+                self.end(channel, game)
+
+    def end(self, channel: discord.abc.Messageable, game: Game=None) -> Optional[Game]:
+        """Stops and removes the game in `channel`, cancelling its questions.
+
+        Args:
+            channel: The channel to stop the game in.
+            game: Only end it if it's still this game.
+
+        Returns:
+            Optional[Game]: the game that was ended, if any.
+        """
+        if game is not None and self._games.get(channel) is not game:
+            return None
+        game = self._games.pop(channel, None)
+        if game is None:
+            return None
+
+        game.running = False
+        for q, timer in list(game.questions.items()):
+            game.questions.pop(q, None)
+            if not q: continue
+            timer.cancel()
+        return game
@@ -0,0 +1,149 @@
+# in-memory ranked scoreboard
+# indexable skiplist (see https://code.activestate.com/recipes/576930/) ordered by (-score, discord_id),
+# so the top k is a walk along the bottom level and a player's rank is a single O(log n) search.
+import random
+from typing import *
+
+_MAX_LEVELS = 32  # plenty for 2 ** 32 players
+
+
+class _Node(object):
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: tuple, levels: int):
+        self.key: tuple = key
+        self.next: List[Optional['_Node']] = [None] * levels
+        # number of bottom level steps to self.next[level]
+        self.width: List[int] = [1] * levels
+
+
+_NIL = _Node((float("inf"),), 0)
+
+
+class Leaderboard(object):
+    """Players ordered by score (highest first, ties by discord id), along with their names.
+    """
+    def __init__(self):
+        self.head: _Node = _Node((), _MAX_LEVELS)
+        self.head.next = [_NIL] * _MAX_LEVELS
+        self.scores: Dict[int, int] = {}
+        self.names: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __contains__(self, discord_id: int) -> bool:
+        return discord_id in self.scores
+
+    def score(self, discord_id: int) -> Optional[int]:
+        """Gets a player's score.
+
+        Args:
+            discord_id: The user id of the Discord member.
+
+        Returns:
+            Optional[int]: Score (int) if user exists, None otherwise.
+        """
+        return self.scores.get(discord_id)
+
+    def update(self, discord_id: int, score: int, name: str=None) -> None:
+        """Sets a player's score (and name, if given).
+
+        Args:
+            discord_id: The user id of the Discord member.
+            score: Their new total score.
+            name: The name#discriminator of the member.
+
+        Returns:
+            None
+        """
+        old = self.scores.get(discord_id)
+        if old is not None:
+            self._remove((-old, discord_id))
+        self._insert((-score, discord_id))
+        self.scores[discord_id] = score
+        if name:
+            self.names[discord_id] = name
+
+    def rank(self, discord_id: int) -> Optional[int]:
+        """Gets a player's position on the leaderboard, starting at 1.
+
+        Args:
+            discord_id: The user id of the Discord member.
+
+        Returns:
+            Optional[int]: Rank if the user has a score, None otherwise.
+        """
+        score = self.scores.get(discord_id)
+        if score is None:
+            return None
+
+        key = (-score, discord_id)
+        node, steps = self.head, 0
+        for level in reversed(range(_MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps += node.width[level]
+                node = node.next[level]
+        return steps + 1
+
+    def top(self, num: int=10) -> List[Tuple[int, int, Optional[str]]]:
+        """Gets the top `num` players.
+
+        Args:
+            num: Number of top players to retrieve.
+
+        Returns:
+            List[Tuple[int, int, Optional[str]]]: an ordered list (descending) of tuples of (discord_id, score, name).
+        """
+        top = []
+        node = self.head.next[0]
+        while node is not _NIL and len(top) < num:
+            neg_score, discord_id = node.key
+            top.append((discord_id, -neg_score, self.names.get(discord_id)))
+            node = node.next[0]
+        return top
+
+    def _insert(self, key: tuple) -> None:
+        chain: List[_Node] = [None] * _MAX_LEVELS
+        steps_at_level: List[int] = [0] * _MAX_LEVELS
+        node = self.head
+        for level in reversed(range(_MAX_LEVELS)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = 1
+        while levels < _MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+
+        new = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, _MAX_LEVELS):
+            chain[level].width[level] += 1
+
+    def _remove(self, key: tuple) -> None:
+        chain: List[_Node] = [None] * _MAX_LEVELS
+        node = self.head
+        for level in reversed(range(_MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), _MAX_LEVELS):
+            chain[level].width[level] -= 1
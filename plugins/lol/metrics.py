@@ -0,0 +1,239 @@
+# latency histograms and counters
+# everything is plain dicts/lists touched only from the event loop thread, recording a value is a bisect and a few
+# increments so it can sit on the on_message path. exported as Prometheus text or JSON.
+import asyncio
+import bisect
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import *
+
+import discord
+
+# upper bounds in seconds, 50us doubling up to ~105s
+BUCKETS: Tuple[float, ...] = tuple(0.00005 * 2 ** x for x in range(22))
+
+TFunc = TypeVar('TFunc', bound=Callable)
+
+
+class Histogram(object):
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        # counts[x] is the number of values <= BUCKETS[x] (and > BUCKETS[x - 1]), the last one is everything bigger
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the `q` quantile (0-1), interpolated inside the bucket it falls in.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for x, num in enumerate(self.counts):
+            if num and seen + num >= rank:
+                lower = BUCKETS[x - 1] if x else 0.0
+                upper = BUCKETS[x] if x < len(BUCKETS) else BUCKETS[-1] * 2
+                return lower + (upper - lower) * (rank - seen) / num
+            seen += num
+        return BUCKETS[-1]
+
+
+class Metrics(object):
+    """Latency histograms and counters, both by (family, name), e.g. ("command", "trivia info").
+    """
+    def __init__(self, namespace: str="lol_trivia"):
+        self.namespace: str = namespace
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+        self.started: float = time.time()
+
+    def observe(self, family: str, name: str, seconds: float) -> None:
+        histogram = self.histograms.get((family, name))
+        if histogram is None:
+            histogram = self.histograms[(family, name)] = Histogram()
+        histogram.observe(seconds)
+
+    def inc(self, family: str, name: str, num: int=1) -> None:
+        key = (family, name)
+        self.counters[key] = self.counters.get(key, 0) + num
+
+    @contextmanager
+    def timer(self, family: str, name: str) -> Iterator[None]:
+        """Records how long the with block took.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(family, name, time.perf_counter() - start)
+
+    def timed(self, family: str, name: str=None) -> Callable[[TFunc], TFunc]:
+        """Decorator recording how long each call of a function (or coroutine function) takes.
+
+        Args:
+            family: The histogram family.
+            name: The histogram name, defaults to the function name.
+        """
+        def decorator(func: TFunc) -> TFunc:
+            key = name or func.__name__
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(family, key, time.perf_counter() - start)
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        self.observe(family, key, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def to_json(self) -> dict:
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "buckets": list(BUCKETS),
+            "histograms": {f"{family}.{name}": {"count": h.count, "sum": h.sum, "counts": h.counts,
+                                                "p50": h.quantile(.5), "p95": h.quantile(.95), "p99": h.quantile(.99)}
+                           for (family, name), h in sorted(self.histograms.items())},
+            "counters": {f"{family}.{name}": num for (family, name), num in sorted(self.counters.items())}
+        }
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = [f"# TYPE {self.namespace}_uptime_seconds gauge",
+                            f"{self.namespace}_uptime_seconds {time.time() - self.started:.3f}"]
+        families: Set[str] = set()
+        for (family, name), h in sorted(self.histograms.items()):
+            metric = f"{self.namespace}_{family}_seconds"
+            if family not in families:
+                families.add(family)
+                lines.append(f"# TYPE {metric} histogram")
+            label = f'name="{_escape(name)}"'
+            cumulative = 0
+            for bound, num in zip(BUCKETS, h.counts):
+                cumulative += num
+                lines.append(f'{metric}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {h.count}')
+            lines.append(f'{metric}_sum{{{label}}} {h.sum:.6f}')
+            lines.append(f'{metric}_count{{{label}}} {h.count}')
+        families.clear()
+        for (family, name), num in sorted(self.counters.items()):
+            metric = f"{self.namespace}_{family}_total"
+            if family not in families:
+                families.add(family)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f'{metric}{{name="{_escape(name)}"}} {num}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Write the metrics to `path`, as JSON if it ends with .json and Prometheus text otherwise.
+        """
+        data = json.dumps(self.to_json()) if path.endswith(".json") else self.to_prometheus()
+        with open(f"{path}.tmp", "w") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def summary(self) -> List[str]:
+        """One line per histogram/counter, for reading in chat.
+        """
+        lines = [f"{'histogram':36} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+        for (family, name), h in sorted(self.histograms.items()):
+            lines.append(f"{family + '.' + name:36.36} {h.count:7} {h.quantile(.5) * 1000:8.2f} "
+                         f"{h.quantile(.95) * 1000:8.2f} {h.quantile(.99) * 1000:8.2f}")
+        lines.append("")
+        lines.append(f"{'counter':36} {'total':>7}")
+        for (family, name), num in sorted(self.counters.items()):
+            lines.append(f"{family + '.' + name:36.36} {num:7}")
+        return lines
+
+
+def rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB, None where /proc isn't available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _escape(label: str) -> str:
+    return label.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = Metrics()
+
+
+class StartupReport(object):
+    """How long each phase of starting up took, in the order they ran.
+    """
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self.failed: Optional[str] = None
+        self.done: bool = False
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Records how long the with block took as phase `name` (or that it failed).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.failed = f"{name}: {e!r}"
+            name += " (failed)"
+            raise
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def finish(self) -> None:
+        """Marks startup as done and puts every phase in the metrics too (under "startup").
+        """
+        self.done = True
+        self.failed = None
+        for name, seconds in self.phases:
+            METRICS.observe("startup", name, seconds)
+
+    def summary(self) -> List[str]:
+        """One line per phase, for logging and reading in chat.
+        """
+        lines = [f"{'phase':40} {'ms':>9}"]
+        lines += [f"{name:40.40} {seconds * 1000:9.1f}" for name, seconds in self.phases]
+        status = "done" if self.done else f"failed ({self.failed})" if self.failed else "in progress"
+        lines.append(f"{'total (' + status + ')':40.40} {sum(s for _, s in self.phases) * 1000:9.1f}")
+        return lines
+
+
+STARTUP = StartupReport()
+
+
+async def send(destination: discord.abc.Messageable, *args, **kwargs) -> discord.Message:
+    """destination.send(*args, **kwargs), timed and counted.
+    """
+    start = time.perf_counter()
+    try:
+        return await destination.send(*args, **kwargs)
+    except Exception:
+        METRICS.inc("send_errors", type(destination).__name__)
+        raise
+    finally:
+        METRICS.observe("send", type(destination).__name__, time.perf_counter() - start)
@@ -1,34 +1,95 @@
+import asyncio
+import functools
+import logging
 import random
-from collections import Counter
+from collections import Counter, OrderedDict, deque
 from typing import *
 
 import discord
-import cassiopeia as riotapi
-# from cassiopeia.core.common import Map
-from cassiopeia.core.staticdata import *
-from cassiopeia.core.staticdata.champion import ChampionSpell, Skin
 from fuzzywuzzy import fuzz
 
-from . import util, config
+from . import static, util, config
+from .metrics import METRICS, send
+from .sampler import AliasTable
+from .text import censor_name
+from .static import Champion, ChampionSpell, Item, Rune, Skin, SummonerSpell
+
+logger = logging.getLogger(__name__)
 
 ALLOWED_MODES: Set[str] = {mode.upper() for mode in config["trivia"]["allowed_modes"]}
-ALLOWED_SPELLS: List[SummonerSpell] = \
-    [spell for spell in riotapi.get_summoner_spells() if not ALLOWED_MODES.isdisjoint(util.find_in_data(spell, "modes"))]
 
 # ALLOWED_MAPS: Set[str] = \
 #     {str(Map[map.lower()].value) if not map.isdigit() else map for map in config["trivia"]["allowed_maps"]}
-ALLOWED_MAPS: Set[int] = \
-    {int(riotapi.get_maps()[map].id) if not map.isdigit() else int(map) for map in config["trivia"]["allowed_maps"]}
+@static.derived
+def _allowed_maps(data: static.StaticData) -> Set[int]:
+    return {data.maps[map] if not map.isdigit() else int(map) for map in config["trivia"]["allowed_maps"]}
 
-print(ALLOWED_MAPS)
-ALLOWED_ITEMS: List[Item] = []
-for item in riotapi.get_items():
+
+@static.derived
+def _allowed_spells(data: static.StaticData) -> List[SummonerSpell]:
+    return [spell for spell in data.summoner_spells if not ALLOWED_MODES.isdisjoint(spell.modes)]
+
+
+@static.derived
+def _allowed_items(data: static.StaticData) -> List[Item]:
     # print(list(map.id for map in item.maps))
-    if not ALLOWED_MAPS.isdisjoint(int(map.id) for map in item.maps):
-        ALLOWED_ITEMS.append(item)
+    return [item for item in data.items.values() if not _allowed_maps(data).isdisjoint(item.maps)]
+
+
+# filled in for the current data by _swap_allowed
+ALLOWED_MAPS: Set[int] = set()
+ALLOWED_SPELLS: List[SummonerSpell] = []
+ALLOWED_ITEMS: List[Item] = []
+
+
+@util.on_swap
+def _swap_allowed(data: static.StaticData) -> None:
+    global ALLOWED_MAPS, ALLOWED_SPELLS, ALLOWED_ITEMS
+    ALLOWED_MAPS, ALLOWED_SPELLS, ALLOWED_ITEMS = _allowed_maps(data), _allowed_spells(data), _allowed_items(data)
+    logger.info(f"Allowed maps for {data.version}: {ALLOWED_MAPS}")
+
 
 PERCENT_STATS: List[str] = ["percent", "spell_vamp", "life_steal", "tenacity", "critical", "attack_speed", "cooldown"]
 
+
+class AnswerMatcher(object):
+    """The accepted answers to a question, normalized once when the question is made.
+    """
+    def __init__(self, answers: List[str], fuzzywuzzy: bool, modifier: Callable[[str], str]):
+        self.answers: List[str] = answers
+        self.fuzzywuzzy: bool = fuzzywuzzy
+        self.modifier: Callable[[str], str] = modifier
+
+        self.normalized: List[str] = [modifier(ans).lower() for ans in answers]
+        self.exact: Dict[str, int] = {}
+        for x, ans in enumerate(self.normalized):
+            self.exact.setdefault(ans, x)
+
+    def match(self, text: str) -> Optional[str]:
+        """Checks an answer attempt.
+
+        Args:
+            text: The attempt.
+
+        Returns:
+            Optional[str]: The first accepted answer it matches, None if it's wrong.
+        """
+        msg: str = self.modifier(text).lower()
+        first: int = self.exact.get(msg, len(self.answers))
+
+        if self.fuzzywuzzy:
+            # an earlier answer could still be a fuzzy match
+            length = len(msg)
+            for x in range(first):
+                ans = self.normalized[x]
+                # fuzz.ratio is 2 * matches / total length, it can't round up to 90 (89.5) unless the
+                # shorter string is at least .895 / 2 of the total
+                if 2000 * min(length, len(ans)) >= 895 * (length + len(ans)) and fuzz.ratio(ans, msg) >= 90:
+                    return self.answers[x]
+
+        return self.answers[first] if first < len(self.answers) else None
+
+
 class Question(object):
     """A trivia question
     """
@@ -51,6 +112,7 @@ class Question(object):
         self.extra: str = extra
         self.fuzzywuzzy: bool = fuzzywuzzy
         self.modifier: Callable[[str], str] = modifier
+        self.matcher: AnswerMatcher = AnswerMatcher(self.a, fuzzywuzzy, modifier)
 
         self.active: bool = True
 
@@ -63,7 +125,7 @@ class Question(object):
         Returns:
             None
         """
-        await channel.send(self.q.title, embed=self.q)
+        await send(channel, self.q.title, embed=self.q)
 
     async def expire(self, channel: discord.TextChannel):
         """Expire the question and end the game in chat.
@@ -76,27 +138,20 @@ class Question(object):
         """
         self.active = False
         correct: str = '/'.join(random.sample(self.a, min(3, len(self.a)))) + ('/etc...' if len(self.a) > 3 else '')
-        await channel.send(f"Time's up! The correct answer was '{correct}'{self.extra}.")
+        await send(channel, f"Time's up! The correct answer was '{correct}'{self.extra}.")
 
-    async def answer(self, message: discord.Message, get_score: Callable[[str], int]) -> int:
+    async def answer(self, message: discord.Message, get_score: Callable[[int], Awaitable[Optional[int]]]) -> int:
         if not self.active: return False
 
-        msg: str = self.modifier(message.content).lower()
-
-        for ans in self.a:
-            mod_ans: str = self.modifier(ans).lower()
-
-            if (self.fuzzywuzzy and fuzz.ratio(mod_ans, msg) >= 90) or (mod_ans == msg):
-                break
-        else:
+        ans: Optional[str] = self.matcher.match(message.content)
+        if ans is None:
             return False
 
         self.active = False
         points: int = config['trivia']['points']
-        await message.channel.send(
-            f"Correct answer '{ans}'{self.extra} by {message.author.mention}! +{points} points"
-            f" (new score: {(get_score(message.author.id) or 0) + points})"
-        )
+        await send(message.channel,
+                   f"Correct answer '{ans}'{self.extra} by {message.author.mention}! +{points} points"
+                   f" (new score: {(await get_score(message.author.id) or 0) + points})")
         return points
 
     def set_thumbnail(self, *args, **kwargs) -> 'Question':
@@ -115,50 +170,73 @@ class Question(object):
         return self.active
 
 
-def censor_name(text: str, *args: str, replacement: str="XXXXXXX") -> str:
-    for word in args:
-        text = text.replace(word, replacement)
-    return text
+T = TypeVar('T')
+_RANDOM = object()
+
+
+def pool(builder: Callable[[static.StaticData], Iterable[T]]) -> Callable[[Callable[[T], Question]], Callable[..., Question]]:
+    """Decorator declaring what a question generator asks about.
+
+    The pool is built once per data version, the generator gets called with a random entry of it
+    (or the one it's given, e.g. `champ_from_title(champ)`).
+
+    Args:
+        builder: Function returning every entity the question can be about.
+    """
+    def decorator(func: Callable[[T], Question]) -> Callable[..., Question]:
+        @static.derived
+        def entities(data: static.StaticData) -> Tuple[T, ...]:
+            return tuple(builder(data))
+        entities.__qualname__ = entities.__name__ = f"{func.__name__}_pool"
+
+        @functools.wraps(func)
+        @METRICS.timed("generator", func.__name__)
+        def generate(entity: T=_RANDOM) -> Question:
+            if entity is _RANDOM:
+                entity = random.choice(entities(util.DATA))
+            return func(entity)
+
+        generate.pool = entities
+        return generate
+    return decorator
 
 
 # A lot of these use very similar "boilerplate" (getting the champ, spells, etc).
 # Hesitant to combine similar ones and use random.choice((Question(), Question(), ...)) as it changes
 # the probability of getting certain question types.
-def champ_from_spell() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
+@pool(lambda data: [champ for champ in data.champions if champ.spells])
+def champ_from_spell(champ: Champion) -> Question:
     spell: ChampionSpell = random.choice(champ.spells)
 
     return Question(f"Which champion has an ability called '{spell.name}'?", None, champ.name,
-                    extra=f" ({spell.keyboard_key.name})")
+                    extra=f" ({spell.keyboard_key})")
 
 
-def spell_from_champ() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
+@pool(lambda data: [champ for champ in data.champions if champ.spells])
+def spell_from_champ(champ: Champion) -> Question:
     spell: ChampionSpell = random.choice(champ.spells)
 
-    return Question(f"What's the name of {champ.name}'s {spell.keyboard_key.name}?", None, spell.name)\
-        .set_thumbnail(url=util.get_image_link(spell.image_info))
+    return Question(f"What's the name of {champ.name}'s {spell.keyboard_key}?", None, spell.name)\
+        .set_thumbnail(url=util.get_image_link(spell.image))
 
 
-def spell_from_desc() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
+@pool(lambda data: [champ for champ in data.champions if champ.spells])
+def spell_from_desc(champ: Champion) -> Question:
     spell: ChampionSpell = random.choice(champ.spells)
-    desc: str = censor_name(util.SANITIZER.handle(spell.description), champ.name, spell.name)
+    desc: str = util.get_text("spell", f"{champ.id}{spell.keyboard_key}", "description", censored=True)
 
     return Question("What's the name of this spell?", desc, spell.name,
-                    extra=f" ({champ.name} {spell.keyboard_key.name})") \
-        .set_thumbnail(url=util.get_image_link(spell.image_info))
+                    extra=f" ({champ.name} {spell.keyboard_key})") \
+        .set_thumbnail(url=util.get_image_link(spell.image))
 
 
-def champ_from_title() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
-
+@pool(lambda data: data.champions)
+def champ_from_title(champ: Champion) -> Question:
     return Question(f"Which champion is '{champ.title}'?", None, champ.name)
 
 
-def title_from_champ() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
-
+@pool(lambda data: data.champions)
+def title_from_champ(champ: Champion) -> Question:
     def remove_the(text: str) -> str:
         return text[3:].strip() if text.lower().startswith("the") else text
 
@@ -166,75 +244,72 @@ def title_from_champ() -> Question:
         .set_thumbnail(url=util.get_image_link(champ.image))
 
 
-def champ_from_lore() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
-    lore: str = censor_name(util.SANITIZER.handle(champ.blurb), champ.name)
+@pool(lambda data: data.champions)
+def champ_from_lore(champ: Champion) -> Question:
+    lore: str = util.get_text("champion", champ.id, "blurb", censored=True)
 
     return Question("Which champion's lore is this?", lore, champ.name)
 
 
-def champ_from_quote() -> Question:
-    champ_name: str = random.choice(list(util.QUOTES.keys()))
-    quote: str = random.choice(util.QUOTES[champ_name])
+@pool(lambda data: [(name, tuple(quotes)) for name, quotes in data.quotes.items() if quotes])
+def champ_from_quote(champ_quotes: Tuple[str, Tuple[str, ...]]) -> Question:
+    champ_name, quotes = champ_quotes
+    quote: str = random.choice(quotes)
 
     return Question("Which champion says the following line?", quote, champ_name)
 
 
-def champ_from_skins() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
+@pool(lambda data: [champ for champ in data.champions if len(champ.skins) > 1])
+def champ_from_skins(champ: Champion) -> Question:
     skins: str = censor_name('\n'.join([f'- "{skin.name}"' for skin in champ.skins[1:]]), *champ.name.split())
 
     return Question("Which champion's skins are these?", skins, champ.name)
 
 
-def champ_from_splash() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
+@pool(lambda data: [champ for champ in data.champions if len(champ.skins) > 1])
+def champ_from_splash(champ: Champion) -> Question:
     # skins[0] is the classic skin
     skin: Skin = random.choice(champ.skins[1:])
 
     return Question("Which skin is this?", None, skin.name).set_image(url=skin.loading_image_url)
 
 
-def champ_from_passive() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
-    desc: str = util.SANITIZER.handle(censor_name(champ.passive.description, champ.name))
+@pool(lambda data: data.champions)
+def champ_from_passive(champ: Champion) -> Question:
+    desc: str = util.get_text("passive", champ.id, "description", censored=True)
 
     return Question("Which champion's passive is this?", desc, champ.name)
 
 
-def passive_from_champ() -> Question:
-    champ: Champion = random.choice(riotapi.get_champions())
-
+@pool(lambda data: data.champions)
+def passive_from_champ(champ: Champion) -> Question:
     return Question(f"What is the name of {champ.name}'s passive?", None, champ.passive.name).\
-        set_thumbnail(url=util.get_image_link(champ.passive.image_info))
+        set_thumbnail(url=util.get_image_link(champ.passive.image))
 
 
-def summ_from_tooltip() -> Question:
-    spell: SummonerSpell = random.choice(ALLOWED_SPELLS)
-    desc: str = util.SANITIZER.handle(censor_name(util.parse_tooltip(spell, spell.tooltip), spell.name))
+@pool(lambda data: _allowed_spells(data))
+def summ_from_tooltip(spell: SummonerSpell) -> Question:
+    desc: str = util.get_text("summoner_spell", spell.id, "tooltip", censored=True)
 
     return Question("Which summoner spell is this?", desc, spell.name)
 
 
-def cd_from_summ() -> Question:
-    spell: SummonerSpell = random.choice(ALLOWED_SPELLS)
-
+@pool(lambda data: _allowed_spells(data))
+def cd_from_summ(spell: SummonerSpell) -> Question:
     return Question(f"What's the base cool down of '{spell.name}'?", None, str(spell.cooldowns[0]), fuzzywuzzy=False).\
         set_thumbnail(url=util.get_image_link(spell.image))
 
 
-def item_buy_gold() -> Question:
-    item: Item = random.choice([item for item in ALLOWED_ITEMS if item.gold.total > 0])
-
+@pool(lambda data: [item for item in _allowed_items(data) if item.gold.total > 0])
+def item_buy_gold(item: Item) -> Question:
     return Question(f"How much is '{item.name}'?", None, str(item.gold.total), fuzzywuzzy=False).\
         set_thumbnail(url=util.get_image_link(item.image))
 
 
-def item_text() -> Question:
-    item: Item = random.choice(ALLOWED_ITEMS)
-
-    return Question("Which item is this?", util.SANITIZER.handle(item.plaintext), item.name).\
-        add_field(name="Stats", value=censor_name(util.SANITIZER.handle(item.description), item.name))
+@pool(lambda data: _allowed_items(data))
+def item_text(item: Item) -> Question:
+    return Question("Which item is this?", util.get_text("item", item.id, "plaintext"), item.name).\
+        add_field(name="Stats", value=util.get_text("item", item.id, "description", censored=True))
 
 
 # TODO: Update for new Cass!
@@ -257,41 +332,221 @@ def item_text() -> Question:
 #         set_thumbnail(url=util.get_image_link(item.image))
 
 
-def items_from_component() -> Question:
-    item: Item = random.choice([item for item in ALLOWED_ITEMS if item.builds_into])
-
-    return Question("What is one item this builds into?", item.name, {c.name for c in item.builds_into}).\
+@pool(lambda data: _recipes(data).components)
+def items_from_component(item: Item) -> Question:
+    return Question("What is one item this builds into?", item.name, _recipes(util.DATA).builds_into[item.id]).\
         set_thumbnail(url=util.get_image_link(item.image))
 
 
-def item_from_components() -> Question:
-    items: List[Item] = [item for item in ALLOWED_ITEMS if len(item.builds_from) > 1]
+@pool(lambda data: _recipes(data).compounds)
+def item_from_components(item: Item) -> Question:
+    components: Counter[int] = Counter(item.builds_from)
+    components_str: str = '\n'.join([f"- {util.DATA.items[component].name} x {number}"
+                                    for component, number in components.items()])
 
-    components: Counter[Item] = Counter(random.choice(items).builds_from)
-    components_str: str = '\n'.join([f"- {item.name} x {number}" for item, number in components.items()])
-
-    correct_items: Set[str] = {item.name for item in items if Counter(item.builds_from) == components}
+    correct_items: Set[str] = _recipes(util.DATA).builds_from[tuple(sorted(components.elements()))]
 
     return Question("What is one item that builds from these items?", components_str, correct_items)
 
 
-def rune_from_desc() -> Question:
-    rune: Rune = random.choice(riotapi.get_runes())
-    desc: str = censor_name(util.SANITIZER.handle(rune.long_description), *rune.name.split())
-
-    return Question("What's the name of this rune?", desc, rune.name, extra=f" ({rune.path.value} Tree)")
+@pool(lambda data: data.runes)
+def rune_from_desc(rune: Rune) -> Question:
+    desc: str = util.get_text("rune", rune.id, "long_description", censored=True)
 
+    return Question("What's the name of this rune?", desc, rune.name, extra=f" ({rune.path} Tree)")
 
-def tree_from_rune() -> Question:
-    rune: Rune = random.choice(riotapi.get_runes())
 
-    return Question(f"What tree is {rune.name} from?", None, rune.path.value)
+@pool(lambda data: data.runes)
+def tree_from_rune(rune: Rune) -> Question:
+    return Question(f"What tree is {rune.name} from?", None, rune.path)
 
 
 def get_random_question(force_index: int=None) -> Question:
-    if force_index is not None and (0 <= force_index < len(_questions)):
-        return _questions[force_index]()
-    return random.choice(_questions)()
+    return _questions[_question_index(force_index)]()
+
+
+def _question_index(force_index: int=None) -> int:
+    # question types with nothing to ask about are never picked, even when forced
+    available: Tuple[int, ...] = _available_questions(util.DATA)
+    if force_index is not None and (0 <= force_index < len(_questions)) and _questions[force_index].pool(util.DATA):
+        return force_index
+    return random.choice(available)
+
+
+class QuestionSampler(object):
+    """Picks (question type, entity) pairs: types by weight, then an entity the channel hasn't seen recently.
+    """
+    def __init__(self, weights: Dict[str, float]=None, window: int=20, max_channels: int=4096):
+        """
+        Args:
+            weights: Weight of each question type by generator name, 1 if not given. 0 disables a type.
+            window: Number of recent questions per channel that won't be asked again.
+            max_channels: Number of channels to remember recent questions for (least recently played are forgotten).
+        """
+        self.weights: Dict[str, float] = weights or {}
+        self.window: int = window
+        self.max_channels: int = max_channels
+        unknown = set(self.weights) - {func.__name__ for func in _questions}
+        if unknown:
+            logger.warning(f"Weights given for unknown question types {', '.join(sorted(unknown))}")
+
+        self._version: Optional[str] = None
+        self._types: Tuple[int, ...] = ()
+        self._table: Optional[AliasTable] = None
+        # channel -> (question index, entity index) of its most recent questions, newest last
+        self._recent: OrderedDict = OrderedDict()
+
+    def _check_version(self) -> None:
+        if self._version == util.DATA.version:
+            return
+        # entity indices are into the old pools, start over
+        types = tuple(x for x in _available_questions(util.DATA) if self.weights.get(_questions[x].__name__, 1) > 0)
+        if not types:
+            raise ValueError("Every question type has a weight of 0 or nothing to ask about")
+        self._table = AliasTable([self.weights.get(_questions[x].__name__, 1) for x in types])
+        self._types = types
+        self._recent.clear()
+        self._version = util.DATA.version
+
+    def draw_type(self, force_index: int=None) -> int:
+        """Picks a question type by weight, `force_index` if it's valid and has something to ask about.
+        """
+        self._check_version()
+        if force_index is not None and (0 <= force_index < len(_questions)) and _questions[force_index].pool(util.DATA):
+            return force_index
+        return self._types[self._table.draw()]
+
+    def excluded(self, channel: Hashable, index: int) -> List[int]:
+        """Entities of question type `index` that were asked about too recently in `channel`, sorted.
+        Always leaves at least one entity of the type askable.
+        """
+        self._check_version()
+        recent = self._recent.get(channel)
+        if not recent:
+            return []
+        limit = len(_questions[index].pool(util.DATA)) - 1
+        excluded: Set[int] = set()
+        for question, entity in reversed(recent):
+            if len(excluded) >= limit:
+                break
+            if question == index:
+                excluded.add(entity)
+        return sorted(excluded)
+
+    def draw_entity(self, channel: Hashable, index: int, excluded: List[int]=None) -> int:
+        """Picks an entity for question type `index`, uniformly out of those not asked about recently in `channel`.
+        """
+        if excluded is None:
+            excluded = self.excluded(channel, index)
+        entity = random.randrange(len(_questions[index].pool(util.DATA)) - len(excluded))
+        # shift past the excluded entities at or below it, giving the entity-th askable one
+        for skip in excluded:
+            if skip > entity:
+                break
+            entity += 1
+        return entity
+
+    def record(self, channel: Hashable, index: int, entity: int) -> None:
+        """Remembers that `channel` got asked question type `index` about `entity`.
+        """
+        self._check_version()
+        if self.window <= 0:
+            return
+        recent = self._recent.get(channel)
+        if recent is None:
+            recent = self._recent[channel] = deque(maxlen=self.window)
+            if len(self._recent) > self.max_channels:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(channel)
+        recent.append((index, entity))
+
+
+class QuestionPool(object):
+    """Keeps a few ready-to-send questions of every type around, so asking one doesn't have to build it first.
+    """
+    def __init__(self, size: int=3, sampler: QuestionSampler=None):
+        """
+        Args:
+            size: Number of questions to keep ready per question type.
+            sampler: Picks the questions, defaults to every type weighted the same.
+        """
+        self.size: int = size
+        self.sampler: QuestionSampler = sampler or QuestionSampler()
+        # (entity index, question) pairs
+        self.buffers: List[Deque[Tuple[int, Question]]] = [deque() for _ in _questions]
+        self._wakeup: asyncio.Event = asyncio.Event()
+
+    def get(self, channel: Hashable=None, force_index: int=None) -> Question:
+        """Picks a question for `channel` with the sampler, taking a ready one if it's about an entity that's allowed.
+        """
+        index = self.sampler.draw_type(force_index)
+        excluded = self.sampler.excluded(channel, index)
+        buffer = self.buffers[index]
+        self._wakeup.set()
+
+        # the buffered entity was drawn uniformly out of the whole pool, so keeping it only when it's allowed (and
+        # drawing out of the allowed ones otherwise) is still uniform over the allowed entities
+        if buffer and buffer[0][0] not in excluded:
+            entity, q = buffer.popleft()
+        else:
+            entity = self.sampler.draw_entity(channel, index, excluded)
+            q = _questions[index](_questions[index].pool(util.DATA)[entity])
+        self.sampler.record(channel, index, entity)
+        return q
+
+    def clear(self) -> None:
+        """Drops every ready question, e.g. when the static data changes (the entity indices are per version).
+        """
+        for buffer in self.buffers:
+            buffer.clear()
+        self._wakeup.set()
+
+    async def fill(self):
+        """Refills the buffers whenever a question is taken. Runs forever.
+        """
+        while True:
+            self._wakeup.clear()
+            data = util.DATA
+            for index in _available_questions(data):
+                buffer = self.buffers[index]
+                entities = _questions[index].pool(data)
+                # stops short if the data gets swapped in the meantime, clear() starts it over
+                while len(buffer) < self.size and util.DATA is data:
+                    try:
+                        entity = random.randrange(len(entities))
+                        buffer.append((entity, _questions[index](entities[entity])))
+                    except Exception:
+                        logger.exception(f"Error pre-generating {_questions[index].__name__} question")
+                        break
+                    # one at a time so nothing else on the loop has to wait on a whole refill
+                    await asyncio.sleep(0)
+            await self._wakeup.wait()
+
+
+class Recipes(NamedTuple):
+    # allowed items that build into something
+    components: List[Item]
+    # allowed items that build from more than one item
+    compounds: List[Item]
+    # component id -> names of everything it builds into
+    builds_into: Dict[int, FrozenSet[str]]
+    # sorted component ids -> names of the allowed items building from exactly those
+    builds_from: Dict[Tuple[int, ...], Set[str]]
+
+
+@static.derived
+def _recipes(data: static.StaticData) -> Recipes:
+    allowed: List[Item] = _allowed_items(data)
+    components: List[Item] = [item for item in allowed if item.builds_into]
+    compounds: List[Item] = [item for item in allowed if len(item.builds_from) > 1]
+
+    builds_into: Dict[int, FrozenSet[str]] = \
+        {item.id: frozenset(data.items[c].name for c in item.builds_into) for item in components}
+    builds_from: Dict[Tuple[int, ...], Set[str]] = {}
+    for item in compounds:
+        builds_from.setdefault(tuple(sorted(item.builds_from)), set()).add(item.name)
+    return Recipes(components, compounds, builds_into, builds_from)
 
 
 _questions: Tuple[Callable[[], Question]] = (
@@ -316,3 +571,16 @@ _questions: Tuple[Callable[[], Question]] = (
     rune_from_desc,
     tree_from_rune
 )
+
+
+@static.derived
+def _available_questions(data: static.StaticData) -> Tuple[int, ...]:
+    available: List[int] = []
+    for x, func in enumerate(_questions):
+        if func.pool(data):
+            available.append(x)
+        else:
+            logger.warning(f"No eligible entities for {func.__name__} questions (version {data.version}), skipping it")
+    if not available:
+        raise ValueError(f"No question type has anything to ask about (version {data.version})")
+    return tuple(available)
@@ -0,0 +1,40 @@
+# O(1) weighted random choice (Vose's alias method)
+# one uniform index and one coin flip per draw no matter how many choices/how skewed the weights are.
+import random
+from typing import *
+
+
+class AliasTable(object):
+    """Draws indices 0..n-1 with probability proportional to their weight.
+    """
+    def __init__(self, weights: Sequence[float]):
+        """Build the table.
+
+        Args:
+            weights: The weight of every index, at least one has to be positive.
+        """
+        total = sum(weights)
+        if not weights or total <= 0 or min(weights) < 0:
+            raise ValueError(f"Invalid weights {weights!r}")
+
+        num = len(weights)
+        scaled: List[float] = [weight * num / total for weight in weights]
+        self.prob: List[float] = [1.0] * num
+        self.alias: List[int] = list(range(num))
+
+        small: List[int] = [x for x, p in enumerate(scaled) if p < 1]
+        large: List[int] = [x for x, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+        # whatever is left over is 1 give or take float error
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self, rng: random.Random=random) -> int:
+        x = int(rng.random() * len(self.prob))
+        return x if rng.random() < self.prob[x] else self.alias[x]
@@ -0,0 +1,393 @@
+# score service: one process owns the score database, bot processes talk to it over a socket
+# requests are newline delimited JSON ({"id", "op", "args"}), answered in order on each connection. increments from
+# every client land in one write-behind TriviaDB, so they're committed in groups instead of each process fighting
+# over the sqlite lock, and global scores/ranks are answered from its in-memory leaderboard.
+#
+# python -m plugins.lol.scores [--address unix:data/scores.sock] [--db data/users.db]
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from collections import OrderedDict
+from typing import *
+
+from .db import AsyncTriviaDB
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+READ_OPS = ("get_score", "get_top", "get_rank", "cache_name")
+# ScoreService.call result for increments, which are answered after they're committed
+_LATER = object()
+
+
+class ScoreServiceError(Exception):
+    pass
+
+
+def _endpoint(address: str) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+    # "host:port" is TCP, anything else ("unix:path" or just a path) a unix socket
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port), None
+    return None, None, address[5:] if address.startswith("unix:") else address
+
+
+class ScoreService(object):
+    """Serves a score database to ScoreClients.
+
+    Increments are confirmed once they've been committed, `flush_size` of them or every `flush_interval`
+    seconds at a time. Until then clients hold on to them, so a crashed service doesn't lose any.
+    """
+    def __init__(self, file: str, flush_size: int=100, flush_interval: float=5.0):
+        # the service decides when to commit, the database itself never flushes on its own
+        self.db: AsyncTriviaDB = AsyncTriviaDB(file, write_behind=True, flush_size=2 ** 62,
+                                               flush_interval=float("inf"))
+        self.flush_size: int = flush_size
+        self.flush_interval: float = flush_interval
+        # last add_score sequence number counted for each client, so increments it re-sends after a reconnect
+        # (because the confirmation got lost) aren't counted twice. committed along with the scores, so that holds
+        # across restarts of the service too
+        self.committed: Dict[str, int] = dict(self.db.sync.client_seqs)
+        self.applied: Dict[str, int] = dict(self.committed)
+        # first increment of each client that failed to be counted. later ones are refused until it's been re-sent
+        # and counted, so everything up to applied[client] is always counted
+        self.failed: Dict[str, int] = {}
+        # (connection, request id) of every increment waiting for the next commit
+        self.uncommitted: List[Tuple[asyncio.StreamWriter, int]] = []
+        self._commit_now: asyncio.Event = asyncio.Event()
+
+    async def call(self, request: dict, writer: asyncio.StreamWriter) -> Any:
+        op, args = request["op"], request.get("args", [])
+        if op == "add_score":
+            client, seq = request["client"], request["seq"]
+            if seq > self.failed.get(client, seq):
+                raise ScoreServiceError(f"Increment {self.failed[client]} of {client} failed, re-send that first")
+            previous = self.applied.get(client, 0)
+            if seq > previous:
+                self.applied[client] = seq
+                try:
+                    await self.db.add_score(*args)
+                except Exception:
+                    self.applied[client] = previous
+                    self.failed[client] = seq
+                    raise
+                self.failed.pop(client, None)
+            # a re-sent one may have been counted but not committed yet, so it's confirmed by the next commit too
+            self.uncommitted.append((writer, request["id"]))
+            if len(self.uncommitted) >= self.flush_size:
+                self._commit_now.set()
+            return _LATER
+        if op == "flush":
+            return await self.commit()
+        if op not in READ_OPS:
+            raise ValueError(f"Unknown operation {op!r}")
+        return await getattr(self.db, op)(*args)
+
+    async def commit(self) -> None:
+        """Writes every queued increment in one transaction and confirms them.
+        """
+        batch, self.uncommitted = self.uncommitted, []
+        client_seqs = {client: seq for client, seq in self.applied.items() if seq > self.committed.get(client, 0)}
+        try:
+            await self.db.flush(client_seqs)
+        except Exception:
+            logger.exception("Couldn't commit scores, retrying with the next batch")
+            self.uncommitted[:0] = batch
+            return
+        self.committed.update(client_seqs)
+        for writer, request_id in batch:
+            if not writer.is_closing():
+                writer.write(json.dumps({"id": request_id, "result": None}).encode() + b'\n')
+
+    async def run_commits(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._commit_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._commit_now.clear()
+            await self.commit()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                response = {"id": request["id"]}
+                try:
+                    response["result"] = await self.call(request, writer)
+                except Exception as e:
+                    logger.exception(f"Score request {request.get('op')!r} failed")
+                    response["error"] = f"{type(e).__name__}: {e}"
+                if response.get("result") is _LATER:
+                    continue
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError, KeyError):
+            logger.exception("Dropping score client")
+        finally:
+            writer.close()
+
+    async def serve(self, address: str) -> asyncio.AbstractServer:
+        host, port, path = _endpoint(address)
+        if path is None:
+            return await asyncio.start_server(self.handle, host, port)
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(self.handle, path)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class ScoreClient(object):
+    """Same interface as AsyncTriviaDB, backed by a ScoreService.
+
+    Score increments never wait on the service: they're sent if it's up and kept until it confirms them, and
+    re-sent when it comes back after going down (or after `retry_interval` if it answered with an error).
+    Reads while it's down fall back to what this client last saw.
+    """
+    def __init__(self, address: str, *, client_id: str=None, timeout: float=2.0, retry_interval: float=1.0,
+                 loop: asyncio.AbstractEventLoop=None):
+        """Connects to the score service in the background.
+
+        Args:
+            address: "host:port", or the path of a unix socket (optionally prefixed with "unix:").
+            client_id: Name the service tells this client's increments apart by, the same after restarting.
+                Defaults to the process name (the launcher names workers after their shards).
+            timeout: Seconds to wait for an answer before falling back on local data.
+            retry_interval: Seconds between connection attempts while the service is down.
+            loop: The event loop to connect on.
+        """
+        self.address: str = address
+        self.timeout: float = timeout
+        self.retry_interval: float = retry_interval
+        # the cog only needs to flush write-behind databases, the service does its own
+        self.write_behind: bool = False
+        self.flush_interval: float = retry_interval
+
+        self.client_id: str = client_id or multiprocessing.current_process().name
+        # microseconds since the epoch, so they keep going up across restarts under the same id
+        self._seq: int = int(time.time() * 1e6)
+        # seq: add_score args, for every increment the service hasn't confirmed yet
+        self._unconfirmed: OrderedDict = OrderedDict()
+        # request id: future for reads, seq for increments (None if nobody's waiting on it)
+        self._requests: Dict[int, Union[asyncio.Future, int, None]] = {}
+        self._next_id: int = 0
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._retry: Optional[asyncio.TimerHandle] = None
+        # last score the service gave for (discord_id, guild_id), for answering while it's down
+        self._known: Dict[Tuple[int, Optional[int]], int] = {}
+        self._loop: asyncio.AbstractEventLoop = loop or asyncio.get_event_loop()
+        self._task: asyncio.Task = self._loop.create_task(self._connect())
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def _send(self, request: dict, waiter: Union[asyncio.Future, int, None]) -> None:
+        self._next_id += 1
+        request["id"] = self._next_id
+        self._requests[self._next_id] = waiter
+        self._writer.write(json.dumps(request).encode() + b'\n')
+
+    async def _connect(self) -> None:
+        host, port, path = _endpoint(self.address)
+        while True:
+            try:
+                if path is None:
+                    reader, self._writer = await asyncio.open_connection(host, port)
+                else:
+                    reader, self._writer = await asyncio.open_unix_connection(path)
+            except OSError:
+                await asyncio.sleep(self.retry_interval)
+                continue
+
+            logger.info(f"Connected to the score service at {self.address}")
+            self._resend()
+            try:
+                await self._read(reader)
+            except (ConnectionError, ValueError):
+                pass
+            finally:
+                self._writer.close()
+                self._writer = None
+                waiting, self._requests = self._requests, {}
+                for waiter in waiting.values():
+                    if isinstance(waiter, asyncio.Future) and not waiter.done():
+                        waiter.set_exception(ConnectionError("Lost the score service"))
+            logger.warning(f"Lost the score service at {self.address}, {len(self._unconfirmed)} "
+                           f"increments buffered")
+            await asyncio.sleep(self.retry_interval)
+
+    def _resend(self) -> None:
+        # everything it hasn't confirmed and isn't working on, in order. it skips whatever it had counted already
+        self._retry = None
+        if not self.connected:
+            return
+        in_flight = {waiter for waiter in self._requests.values() if isinstance(waiter, int)}
+        for seq, args in self._unconfirmed.items():
+            if seq not in in_flight:
+                self._send({"op": "add_score", "client": self.client_id, "seq": seq, "args": args}, seq)
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            response = json.loads(line)
+            waiter = self._requests.pop(response["id"], None)
+            if isinstance(waiter, int):
+                if "error" in response:
+                    # kept, and sent again in a bit
+                    logger.error(f"Score service failed increment {waiter} {self._unconfirmed.get(waiter)}: "
+                                 f"{response['error']}")
+                    METRICS.inc("db_errors", "add_score")
+                    if self._retry is None:
+                        self._retry = self._loop.call_later(self.retry_interval, self._resend)
+                else:
+                    self._unconfirmed.pop(waiter, None)
+            elif waiter is not None and not waiter.done():
+                if "error" in response:
+                    waiter.set_exception(ScoreServiceError(response["error"]))
+                else:
+                    waiter.set_result(response["result"])
+
+    async def _call(self, op: str, *args: Any) -> Any:
+        # raises ConnectionError/asyncio.TimeoutError if the service is down or too slow
+        if not self.connected:
+            raise ConnectionError("Not connected to the score service")
+        start = time.perf_counter()
+        future = self._loop.create_future()
+        self._send({"op": op, "args": args}, future)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            METRICS.observe("db", op, time.perf_counter() - start)
+
+    def _pending(self, discord_id: int, guild_id: int=None) -> int:
+        return sum(args[1] for args in self._unconfirmed.values()
+                   if args[0] == discord_id and (guild_id is None or args[3] == guild_id))
+
+    async def get_score(self, discord_id: int, guild_id: int=None) -> Optional[int]:
+        """See TriviaDB.get_score"""
+        key = (int(discord_id), int(guild_id) if guild_id is not None else None)
+        try:
+            score = await self._call("get_score", *key)
+        except (ConnectionError, asyncio.TimeoutError):
+            METRICS.inc("db_fallbacks", "get_score")
+            known, pending = self._known.get(key), self._pending(*key)
+            return (known or 0) + pending if known is not None or pending else None
+        if score is not None:
+            if len(self._known) >= 100000:
+                self._known.clear()
+            self._known[key] = score
+        return score
+
+    async def add_score(self, discord_id: int, score: int, username: str=None, guild_id: int=None) -> None:
+        """See TriviaDB.add_score"""
+        start = time.perf_counter()
+        self._seq += 1
+        args = [int(discord_id), score, username, int(guild_id) if guild_id is not None else None]
+        self._unconfirmed[self._seq] = args
+        if self.connected:
+            self._send({"op": "add_score", "client": self.client_id, "seq": self._seq, "args": args}, self._seq)
+        else:
+            METRICS.inc("db_fallbacks", "add_score")
+        METRICS.observe("db", "add_score", time.perf_counter() - start)
+
+    async def get_top(self, num: int=10, guild_id: int=None) -> List[Tuple[int, int, str]]:
+        """See TriviaDB.get_top. Empty while the service is down."""
+        try:
+            return [tuple(row) for row in await self._call("get_top", num, guild_id)]
+        except (ConnectionError, asyncio.TimeoutError):
+            METRICS.inc("db_fallbacks", "get_top")
+            return []
+
+    async def get_rank(self, discord_id: int, guild_id: int=None) -> Optional[Tuple[int, int]]:
+        """See TriviaDB.get_rank. None while the service is down."""
+        try:
+            rank = await self._call("get_rank", int(discord_id), guild_id)
+        except (ConnectionError, asyncio.TimeoutError):
+            METRICS.inc("db_fallbacks", "get_rank")
+            return None
+        return tuple(rank) if rank else None
+
+    async def cache_name(self, discord_id: int, username: str) -> None:
+        """See TriviaDB.cache_name. Dropped while the service is down."""
+        if self.connected:
+            self._send({"op": "cache_name", "args": [int(discord_id), username]}, None)
+
+    async def flush(self) -> None:
+        """Asks the service to commit (and confirm) every queued increment now."""
+        try:
+            await self._call("flush")
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+
+    def close(self) -> None:
+        """Disconnects. Increments the service never confirmed are lost (and logged).
+
+        Returns:
+            None
+        """
+        self._task.cancel()
+        if self._retry is not None:
+            self._retry.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        if self._unconfirmed:
+            logger.error(f"Closing with {len(self._unconfirmed)} unconfirmed score increments: "
+                         f"{list(self._unconfirmed.values())}")
+
+
+async def serve_forever(address: str, file: str, flush_size: int, flush_interval: float) -> None:
+    service = ScoreService(file, flush_size, flush_interval)
+    server = await service.serve(address)
+    commits = asyncio.ensure_future(service.run_commits())
+    logger.info(f"Serving scores from '{file}' at {address}")
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_event_loop().add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        commits.cancel()
+        await service.commit()
+        service.close()
+        logger.info("Score service stopped")
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m plugins.lol.scores", description="LoLTrivia score service")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--address", help="host:port or unix socket path (default: db.service in the config)")
+    parser.add_argument("--db", help="sqlite database (default: db.file in the config, or data/users.db)")
+    args = parser.parse_args(argv)
+
+    db_config: dict = {}
+    if os.path.exists(args.config):
+        with open(args.config) as f:
+            db_config = json.load(f).get("plugins.lol", {}).get("db", {})
+    address = args.address or db_config.get("service") or "unix:data/scores.sock"
+    file = args.db or db_config.get("file", "data/users.db")
+
+    logging.basicConfig(format='%(asctime)s::%(name)s::%(levelname)s::%(message)s', level=logging.INFO)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(serve_forever(address, file, db_config.get("flush_size", 100),
+                                          db_config.get("flush_interval", 5.0)))
+
+
+if __name__ == "__main__":
+    main()
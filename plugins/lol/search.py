@@ -0,0 +1,117 @@
+# prebuilt fuzzy search over names
+# gives the exact same results as process.extractOne(name, {item: item.name, ...}, score_cutoff=...) but only runs
+# fuzz.WRatio (which is the slow part) on the candidates that could actually reach the cutoff.
+import functools
+from collections import Counter, defaultdict
+from typing import *
+
+from fuzzywuzzy import fuzz, utils
+
+TItem = TypeVar('TItem')
+
+
+def process_name(name: str) -> str:
+    """Process a string the same way process.extractOne does before calling WRatio.
+    """
+    return utils.full_process(name, force_ascii=True)
+
+
+class SearchIndex(Generic[TItem]):
+    """Fuzzy name search over a fixed collection of items.
+
+    Every WRatio component compares a string made of the query's characters with a string made of the choice's
+    characters, so it can only score `ratio = 2M / (len_a + len_b)` with M at most the number of characters both
+    share. That gives a cheap upper bound on each choice's score: choices that can't reach the cutoff are never
+    scored, and the rest are scored best bound first, stopping once no remaining choice can beat the best match.
+    The exception is partial token set ratio, which compares the common tokens against themselves
+    (partial_ratio("a", "a b") is 100), so choices sharing a whole token with the query get the highest bound
+    WRatio allows for it.
+    """
+    def __init__(self, items: Iterable[TItem], key: Callable[[TItem], str]=lambda item: item.name,
+                 score_cutoff: int=80, cache_size: int=1024):
+        """Build the index.
+
+        Args:
+            items: The items to search, in the order extractOne would see them (decides ties).
+            key: Function returning the name of an item.
+            score_cutoff: Minimum score for a match.
+            cache_size: Number of recent queries to remember.
+        """
+        self.items: List[TItem] = list(items)
+        self.score_cutoff: int = score_cutoff
+
+        self._names: List[str] = [process_name(key(item)) for item in self.items]
+        self._chars: List[Counter] = [Counter(name) for name in self._names]
+        self._token_lengths: List[int] = [_token_set_length(name) for name in self._names]
+        self._tokens: DefaultDict[str, Set[int]] = defaultdict(set)
+        for x, name in enumerate(self._names):
+            for token in name.split():
+                self._tokens[token].add(x)
+
+        self.search = functools.lru_cache(maxsize=cache_size)(self._search)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def candidates(self, query: str) -> List[Tuple[float, int]]:
+        """Upper bounds on the score of every item that could reach `score_cutoff` against the processed query.
+
+        Returns:
+            List[Tuple[float, int]]: (bound, index) pairs, highest bound first.
+        """
+        if not query:
+            return []
+
+        sharing: Set[int] = set()
+        for token in set(query.split()):
+            sharing.update(self._tokens.get(token, ()))
+
+        chars = Counter(query).items()
+        length = len(query)
+        token_length = _token_set_length(query)
+
+        bounds: List[Tuple[float, int]] = []
+        for x, name in enumerate(self._names):
+            if not name:
+                continue
+            choice_chars = self._chars[x]
+            shared = sum(min(num, choice_chars[char]) for char, num in chars if char in choice_chars)
+            if not shared:
+                continue
+
+            # mirrors the branches in fuzz.WRatio
+            base = 200 * shared / (length + len(name))
+            best = min(1.0, 2 * shared / (min(token_length, self._token_lengths[x]) + shared)) * 100
+            len_ratio = max(length, len(name)) / min(length, len(name))
+            if len_ratio < 1.5:
+                bound = max(base, best * .95)
+            else:
+                scale = .6 if len_ratio > 8 else .9
+                bound = max(base, best * scale, (100 if x in sharing else best) * .95 * scale)
+
+            # + 1 for the rounding fuzz does on each component and on the result
+            if bound + 1 >= self.score_cutoff:
+                bounds.append((bound + 1, x))
+
+        bounds.sort(key=lambda pair: (-pair[0], pair[1]))
+        return bounds
+
+    def _search(self, name: str) -> Tuple[Optional[TItem], int]:
+        # extractOne runs full_process on the query, then again with force_ascii
+        query = process_name(utils.full_process(name))
+
+        best_x: int = -1
+        best_score: int = 0
+        for bound, x in self.candidates(query):
+            if bound < max(best_score, self.score_cutoff):
+                break
+            score = fuzz.WRatio(query, self._names[x], full_process=False)
+            # extractOne keeps the first of equal scores
+            if score >= self.score_cutoff and (score > best_score or (score == best_score and x < best_x)):
+                best_x, best_score = x, score
+        return (self.items[best_x], best_score) if best_x >= 0 else (None, 0)
+
+
+def _token_set_length(name: str) -> int:
+    # length of the shortest string any WRatio component can build out of the name (unique tokens, no spaces)
+    return sum(len(token) for token in set(name.split()))
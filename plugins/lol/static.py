@@ -0,0 +1,430 @@
+# compiled static data snapshot
+# everything the plugin needs from the Riot API (+ skins.json/quotes.json) gets compiled into one json file,
+# so starting the bot is just one file read instead of a bunch of API round trips through cass.
+# cassiopeia is only needed to (re)build the snapshot: python -m plugins.lol.static [config.json]
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import *
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1  # bump whenever the layout below changes, old snapshots get rebuilt automatically
+
+T = TypeVar('T')
+_DERIVED: List[Callable[['StaticData'], Any]] = []
+
+
+class Image(NamedTuple):
+    group: str
+    full: str
+
+
+class SpellVar(NamedTuple):
+    key: str
+    link: str
+    coefficients: Tuple[float, ...]
+
+
+class Passive(NamedTuple):
+    name: str
+    description: str
+    sanitized_description: str
+    image: Image
+
+
+class ChampionSpell(NamedTuple):
+    name: str
+    keyboard_key: str
+    description: str
+    sanitized_description: str
+    tooltip: str
+    image: Image
+    cost_burn: Optional[str]
+    cooldown_burn: Optional[str]
+    range_burn: Optional[str]
+    effect_burn: Optional[Tuple[str, ...]]
+    variables: Tuple[SpellVar, ...]
+
+
+class Skin(NamedTuple):
+    id: int
+    name: str
+    loading_image_url: str
+    splash_url: str
+    price: Optional[int]
+    date: Optional[str]
+
+
+class Champion(NamedTuple):
+    id: int
+    name: str
+    title: str
+    blurb: str
+    tags: Tuple[str, ...]
+    image: Image
+    passive: Passive
+    spells: Tuple[ChampionSpell, ...]
+    skins: Tuple[Skin, ...]
+
+
+class SummonerSpell(NamedTuple):
+    id: int
+    name: str
+    tooltip: str
+    cooldowns: Tuple[float, ...]
+    cost_burn: Optional[str]
+    cooldown_burn: Optional[str]
+    range_burn: Optional[str]
+    effect_burn: Optional[Tuple[str, ...]]
+    summoner_level: Optional[int]
+    modes: Tuple[str, ...]
+    variables: Tuple[SpellVar, ...]
+    image: Image
+
+
+class Gold(NamedTuple):
+    total: int
+    sell: int
+    base: int
+
+
+class Item(NamedTuple):
+    id: int
+    name: str
+    description: str
+    plaintext: str
+    image: Image
+    gold: Gold
+    maps: Tuple[int, ...]
+    builds_from: Tuple[int, ...]  # item ids, look them up in StaticData.items
+    builds_into: Tuple[int, ...]
+
+
+class Rune(NamedTuple):
+    id: int
+    name: str
+    long_description: str
+    path: str
+    tier: int
+    image_url: str
+
+
+class SkinInfo(NamedTuple):
+    champ: Champion
+    skin: Skin
+    price: int
+    currency: str
+    date: str
+
+
+class StaticData(object):
+    """One version of the static data, loaded from a snapshot.
+    """
+    def __init__(self, raw: dict):
+        if raw.get("format") != FORMAT:
+            raise ValueError(f"snapshot format {raw.get('format')} != {FORMAT}")
+
+        self.version: str = raw["version"]
+        self.champions: List[Champion] = [_champion(champ) for champ in raw["champions"]]
+        item_ids: Set[int] = {item["id"] for item in raw["items"]}
+        self.items: Dict[int, Item] = {item["id"]: _item(item, item_ids) for item in raw["items"]}
+        self.runes: List[Rune] = [Rune(**rune) for rune in raw["runes"]]
+        self.summoner_spells: List[SummonerSpell] = [_summoner_spell(spell) for spell in raw["summoner_spells"]]
+        self.maps: Dict[str, int] = raw["maps"]
+        self.quotes: Dict[str, List[str]] = raw["quotes"]
+
+        self.skins: Dict[str, SkinInfo] = {}
+        for champ in self.champions:
+            for skin in champ.skins:
+                name = skin.name if skin.name != "default" else f"Classic {champ.name}"
+                currency = "Gemstones" if skin.price and skin.price == 10 else "RP"  # SEND HELP
+                self.skins[name] = SkinInfo(champ, skin, skin.price, currency, skin.date)
+
+        self._derived: Dict[Callable[['StaticData'], Any], Any] = {}
+
+    def warm(self) -> List[Tuple[str, float]]:
+        """Build everything registered with `derived` up front instead of on first use.
+
+        Returns:
+            List[Tuple[str, float]]: (name, seconds) of everything that was built by this call.
+        """
+        timings = []
+        for func in _DERIVED:
+            if func in self._derived:
+                continue
+            start = time.perf_counter()
+            func(self)
+            timings.append((func.__name__, time.perf_counter() - start))
+        return timings
+
+    @classmethod
+    def from_file(cls, path: str) -> 'StaticData':
+        # one bulk read, json.loads on the whole buffer is a lot faster than json.load streaming it
+        with open(path, "rb") as f:
+            return cls(json.loads(f.read()))
+
+
+def derived(func: Callable[[StaticData], T]) -> Callable[[StaticData], T]:
+    """Decorator for anything built from the static data (search indices, question pools, ...).
+
+    The result is built once per StaticData and kept on it, so it always matches the data version it came from.
+    """
+    @functools.wraps(func)
+    def wrapper(data: StaticData) -> T:
+        try:
+            return data._derived[wrapper]
+        except KeyError:
+            value = data._derived[wrapper] = func(data)
+            return value
+
+    _DERIVED.append(wrapper)
+    return wrapper
+
+
+def _image(raw: dict) -> Image:
+    return Image(**raw)
+
+
+def _variables(raw: List[dict]) -> Tuple[SpellVar, ...]:
+    return tuple(SpellVar(var["key"], var["link"], tuple(var["coefficients"])) for var in raw)
+
+
+def _burns(raw: Optional[List[str]]) -> Optional[Tuple[str, ...]]:
+    return tuple(raw) if raw is not None else None
+
+
+def _champion(raw: dict) -> Champion:
+    return Champion(**{
+        **raw,
+        "tags": tuple(raw["tags"]),
+        "image": _image(raw["image"]),
+        "passive": Passive(**{**raw["passive"], "image": _image(raw["passive"]["image"])}),
+        "spells": tuple(ChampionSpell(**{
+            **spell,
+            "image": _image(spell["image"]),
+            "effect_burn": _burns(spell["effect_burn"]),
+            "variables": _variables(spell["variables"])
+        }) for spell in raw["spells"]),
+        "skins": tuple(Skin(**skin) for skin in raw["skins"])
+    })
+
+
+def _summoner_spell(raw: dict) -> SummonerSpell:
+    return SummonerSpell(**{
+        **raw,
+        "cooldowns": tuple(raw["cooldowns"]),
+        "effect_burn": _burns(raw["effect_burn"]),
+        "modes": tuple(raw["modes"]),
+        "variables": _variables(raw["variables"]),
+        "image": _image(raw["image"])
+    })
+
+
+def _item(raw: dict, item_ids: Set[int]) -> Item:
+    # the API sometimes references items that aren't in the item list, drop those
+    return Item(**{
+        **raw,
+        "image": _image(raw["image"]),
+        "gold": Gold(**raw["gold"]),
+        "maps": tuple(raw["maps"]),
+        "builds_from": tuple(id for id in raw["builds_from"] if id in item_ids),
+        "builds_into": tuple(id for id in raw["builds_into"] if id in item_ids)
+    })
+
+
+def load(cfg: dict) -> StaticData:
+    """Load the static data snapshot, compiling it from the Riot API first if it's missing or outdated.
+
+    Args:
+        cfg: The "plugins.lol" config section.
+
+    Returns:
+        StaticData: the loaded data.
+    """
+    path: str = cfg.get("static_data", "data/static.json")
+    try:
+        return StaticData.from_file(path)
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"Static data snapshot '{path}' unusable ({e!r}), compiling a new one from the Riot API.")
+    compile_snapshot(cfg, path)
+    return StaticData.from_file(path)
+
+
+# everything below here talks to the Riot API through cassiopeia, the bot itself never needs it at runtime.
+
+def compile_snapshot(cfg: dict, path: str=None, api: Any=None, workers: int=None) -> dict:
+    """Compile the static data snapshot from the Riot API and data/skins.json + data/quotes.json.
+
+    Args:
+        cfg: The "plugins.lol" config section.
+        path: Where to write the snapshot to. Defaults to the "static_data" config value.
+        api: What to fetch through, cassiopeia by default. Anything with the same get_* functions and objects works
+            (benchmarks/compile.py passes one talking to a local stand-in server).
+        workers: Number of requests in flight at once. Defaults to the "compile_workers" config value (8),
+            1 fetches everything one after another.
+
+    Returns:
+        dict: the raw snapshot that was written.
+    """
+    if api is None:
+        import cassiopeia as api
+
+        api.set_default_region(cfg["api_region"])
+        api.set_riot_api_key(cfg["api_key"])
+    workers = workers or cfg.get("compile_workers", 8)
+
+    with open("data/skins.json", "r") as f:
+        prices: Dict[str, Tuple[int, str]] = json.load(f)
+    with open("data/quotes.json", "r") as f:
+        quotes: Dict[str, List[str]] = json.load(f)
+
+    start = time.perf_counter()
+    # nearly all of this is waiting on round trips, so it's threads. the lists don't depend on each other and get
+    # fetched all at once, then every champion is compiled on the pool too. that walks their spells/passive/skins,
+    # which cass only fetches on first use, so those requests overlap as well.
+    with ThreadPoolExecutor(workers, thread_name_prefix="compile") as pool:
+        lists = {name: pool.submit(getattr(api, f"get_{name}"))
+                 for name in ("versions", "champions", "items", "runes", "summoner_spells", "maps")}
+        lists = {name: future.result() for name, future in lists.items()}
+        # map submits everything right away, so all of these are queued before waiting on any
+        champions = pool.map(functools.partial(_compile_champion, prices=prices), lists["champions"])
+        items = pool.map(_compile_item, lists["items"])
+        runes = pool.map(_compile_rune, lists["runes"])
+        summoner_spells = pool.map(_compile_summoner_spell, lists["summoner_spells"])
+        raw = {
+            "format": FORMAT,
+            "version": lists["versions"][0],
+            "champions": list(champions),
+            "items": list(items),
+            "runes": list(runes),
+            "summoner_spells": list(summoner_spells),
+            "maps": {map.name: int(map.id) for map in lists["maps"]},
+            "quotes": quotes
+        }
+    logger.info(f"Fetched static data for version {raw['version']} in {time.perf_counter() - start:.2f}s "
+                f"({workers} workers)")
+
+    path = path or cfg.get("static_data", "data/static.json")
+    # write to a temp file first so a crash halfway through can't leave a broken snapshot behind
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(raw, f, separators=(',', ':'))
+    os.replace(f"{path}.tmp", path)
+    logger.info(f"Compiled static data snapshot for version {raw['version']} to '{path}'")
+    return raw
+
+
+# A lot of cass static data missing fields and bugs :(
+def find_in_data(obj, name):
+    for dto in obj._data.values():
+        try:
+            return getattr(dto, name)
+        except AttributeError:
+            continue
+
+
+def _compile_image(image) -> dict:
+    return {"group": image.group, "full": image.full}
+
+
+def _compile_burns(obj) -> Dict[str, Any]:
+    effects = find_in_data(obj, "effectBurn")
+    return {
+        "cost_burn": find_in_data(obj, "costBurn"),
+        "cooldown_burn": find_in_data(obj, "cooldownBurn"),
+        "range_burn": find_in_data(obj, "rangeBurn"),
+        "effect_burn": ["" if effect is None else str(effect) for effect in effects] if effects is not None else None
+    }
+
+
+def _compile_variables(spell) -> List[dict]:
+    try:
+        variables = spell.variables
+    except (KeyError, AttributeError):
+        # cass' SummonerSpell.variables raises on spells without any
+        variables = []
+    return [{"key": var.key, "link": var.link, "coefficients": list(var.coefficients)} for var in variables]
+
+
+def _compile_champion(champ, prices: Dict[str, Tuple[int, str]]) -> dict:
+    return {
+        "id": champ.id,
+        "name": champ.name,
+        "title": champ.title,
+        "blurb": champ.blurb,
+        "tags": list(champ.tags),
+        "image": _compile_image(champ.image),
+        "passive": {
+            "name": champ.passive.name,
+            "description": champ.passive.description,
+            "sanitized_description": champ.passive.sanitized_description,
+            "image": _compile_image(champ.passive.image_info)
+        },
+        "spells": [{
+            "name": spell.name,
+            "keyboard_key": spell.keyboard_key.name,
+            "description": spell.description,
+            "sanitized_description": spell.sanitized_description,
+            "tooltip": spell.tooltip,
+            "image": _compile_image(spell.image_info),
+            "variables": _compile_variables(spell),
+            **_compile_burns(spell)
+        } for spell in champ.spells],
+        "skins": [{
+            "id": skin.id,
+            "name": skin.name,
+            "loading_image_url": skin.loading_image_url,
+            "splash_url": skin.splash_url,
+            "price": prices.get(str(skin.id), (None, None))[0],
+            "date": prices.get(str(skin.id), (None, None))[1]
+        } for skin in champ.skins]
+    }
+
+
+def _compile_summoner_spell(spell) -> dict:
+    return {
+        "id": spell.id,
+        "name": spell.name,
+        "tooltip": spell.tooltip,
+        "cooldowns": list(spell.cooldowns),
+        "summoner_level": find_in_data(spell, "summonerLevel"),
+        "modes": list(find_in_data(spell, "modes") or []),
+        "variables": _compile_variables(spell),
+        "image": _compile_image(spell.image),
+        **_compile_burns(spell)
+    }
+
+
+def _compile_item(item) -> dict:
+    return {
+        "id": int(item.id),
+        "name": item.name,
+        "description": item.description,
+        "plaintext": item.plaintext,
+        "image": _compile_image(item.image),
+        "gold": {"total": item.gold.total, "sell": item.gold.sell, "base": item.gold.base},
+        "maps": [int(map.id) for map in item.maps],
+        "builds_from": [int(component.id) for component in item.builds_from],
+        "builds_into": [int(component.id) for component in item.builds_into]
+    }
+
+
+def _compile_rune(rune) -> dict:
+    return {
+        "id": rune.id,
+        "name": rune.name,
+        "long_description": rune.long_description,
+        "path": rune.path.value,
+        "tier": rune.tier,
+        "image_url": rune.image.url
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s::%(name)s::%(levelname)s::%(message)s', level=logging.INFO)
+    with open(sys.argv[1] if len(sys.argv) > 1 else "config.json", "r") as f:
+        compile_snapshot(json.load(f)["plugins.lol"])
@@ -0,0 +1,83 @@
+# cache of sanitized (html2text'd) and censored text
+# all of the descriptions/tooltips/lore shown in questions and info embeds get rendered once per data version,
+# (optionally) spread over a process pool, and saved next to the snapshot so restarts don't redo it.
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import *
+
+import html2text
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1  # bump whenever the way any text gets rendered changes
+
+
+class Job(NamedTuple):
+    key: str
+    text: str
+    censor_before: Tuple[str, ...] = ()  # censored in the raw html
+    censor_after: Tuple[str, ...] = ()  # censored in the sanitized text
+
+
+def censor_name(text: str, *args: str, replacement: str="XXXXXXX") -> str:
+    for word in args:
+        text = text.replace(word, replacement)
+    return text
+
+
+def sanitize(text: str) -> str:
+    # fresh parser every time, a reused HTML2Text carries state over (e.g. a leading space after emphasis)
+    sanitizer = html2text.HTML2Text()
+    sanitizer.ignore_links = True
+    sanitizer.body_width = 0
+    return sanitizer.handle(text)
+
+
+def render(job: Job) -> str:
+    return censor_name(sanitize(censor_name(job.text, *job.censor_before)), *job.censor_after)
+
+
+def load(path: str, version: str) -> Optional[Dict[str, str]]:
+    """Load saved text for a data version.
+
+    Args:
+        path: The file it was saved to.
+        version: The data version it has to be for.
+
+    Returns:
+        Optional[Dict[str, str]]: the text by key, None if there's none saved for this version.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = json.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    if raw.get("format") != FORMAT or raw.get("version") != version:
+        return None
+    return raw["text"]
+
+
+def build(jobs: List[Job], workers: int=0) -> Dict[str, str]:
+    """Render every job.
+
+    Args:
+        jobs: What to render.
+        workers: Number of processes to render with. 0 renders in this process.
+
+    Returns:
+        Dict[str, str]: the rendered text by key.
+    """
+    if workers:
+        with ProcessPoolExecutor(workers) as pool:
+            rendered = list(pool.map(render, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        rendered = [render(job) for job in jobs]
+    return {job.key: text for job, text in zip(jobs, rendered)}
+
+
+def save(path: str, version: str, text: Dict[str, str]) -> None:
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"format": FORMAT, "version": version, "text": text}, f, separators=(',', ':'))
+    os.replace(f"{path}.tmp", path)
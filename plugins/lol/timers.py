@@ -0,0 +1,135 @@
+# hashed timer wheel for question expiry
+# one task ticks through a ring of slots instead of every question sleeping in its own task. scheduling and
+# cancelling are a dict insert/delete, and everything landing on the same tick is expired together in one task.
+import asyncio
+import logging
+import math
+from typing import *
+
+from .metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class Timer(object):
+    """A scheduled callback. Await `done` to wait for it to fire (or be cancelled).
+    """
+    __slots__ = ("wheel", "slot", "rounds", "callback", "args", "cancelled", "done")
+
+    def __init__(self, wheel: 'TimerWheel', slot: int, rounds: int, callback: Callable[..., Awaitable], args: tuple):
+        self.wheel: TimerWheel = wheel
+        self.slot: int = slot
+        # full turns of the wheel left before it's due
+        self.rounds: int = rounds
+        self.callback: Callable[..., Awaitable] = callback
+        self.args: tuple = args
+        self.cancelled: bool = False
+        self.done: asyncio.Future = asyncio.get_event_loop().create_future()
+
+    def cancel(self) -> None:
+        self.wheel.cancel(self)
+
+
+class TimerWheel(object):
+    """Fires coroutine callbacks after a delay, rounded up to the next `tick`.
+    """
+    def __init__(self, tick: float=0.25, slots: int=256):
+        self.tick: float = tick
+        self._slots: List[Dict[Timer, None]] = [{} for _ in range(slots)]
+        self._cursor: int = 0
+        # loop time the cursor slot was expired at, slot cursor + n is due n ticks after it
+        self._time: float = 0.0
+        self._count: int = 0
+        # bumped whenever _time is reset, so a tick that was already under way when that happened gets dropped
+        self._generation: int = 0
+        self._wakeup: asyncio.Event = asyncio.Event()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, delay: float, callback: Callable[..., Awaitable], *args) -> Timer:
+        """Call `await callback(*args)` in `delay` seconds.
+
+        Args:
+            delay: Seconds from now.
+            callback: The coroutine function to call.
+            *args: Its arguments.
+
+        Returns:
+            Timer: the timer, for cancelling it.
+        """
+        now = asyncio.get_event_loop().time()
+        if not self._count:
+            # nothing's been ticking while the wheel was empty, start counting from now
+            self._time = now
+            self._generation += 1
+            self._wakeup.set()
+        ticks = max(1, math.ceil((now + delay - self._time) / self.tick))
+        timer = Timer(self, (self._cursor + ticks) % len(self._slots), (ticks - 1) // len(self._slots), callback, args)
+        self._slots[timer.slot][timer] = None
+        self._count += 1
+        return timer
+
+    def cancel(self, timer: Timer) -> None:
+        """Stops `timer` from firing, if it hasn't already. Whoever is waiting on it is woken up.
+        """
+        if timer.cancelled:
+            return
+        timer.cancelled = True
+        if self._slots[timer.slot].pop(timer, 0) is None:
+            self._count -= 1
+        if not timer.done.done():
+            timer.done.set_result(False)
+
+    def clear(self) -> None:
+        """Cancels every timer.
+        """
+        for slot in self._slots:
+            for timer in list(slot):
+                self.cancel(timer)
+
+    async def run(self) -> None:
+        """Ticks the wheel until cancelled. Sleeps without ticking while there are no timers.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            if not self._count:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            generation = self._generation
+            # _time only moves once the next slot is due, anything scheduled meanwhile counts from the cursor's slot
+            next_time = self._time + self.tick
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if generation != self._generation:
+                # the wheel emptied and started over from a new time while this tick slept, it's stale
+                continue
+            self._time = next_time
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            due = self._advance(self._slots[self._cursor])
+            if due:
+                METRICS.observe("timers", "tick_lag", max(0.0, loop.time() - self._time))
+                METRICS.inc("timers", "expired", len(due))
+                loop.create_task(self._fire(due))
+
+    def _advance(self, slot: Dict[Timer, None]) -> List[Timer]:
+        due = []
+        for timer in list(slot):
+            if timer.rounds:
+                timer.rounds -= 1
+                continue
+            del slot[timer]
+            due.append(timer)
+        self._count -= len(due)
+        return due
+
+    async def _fire(self, due: List[Timer]) -> None:
+        # a timer can still be cancelled between being taken off the wheel and this task starting
+        due = [timer for timer in due if not timer.cancelled]
+        results = await asyncio.gather(*(timer.callback(*timer.args) for timer in due), return_exceptions=True)
+        for timer, result in zip(due, results):
+            if isinstance(result, Exception):
+                logger.error("Timer callback failed", exc_info=result)
+            if not timer.done.done():
+                timer.done.set_result(True)
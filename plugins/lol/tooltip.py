@@ -0,0 +1,121 @@
+# compiled spell tooltips
+# a tooltip is split once into its literal text and the {{ placeholders }} in it, so rendering is a single join
+# instead of a str.replace pass over the whole tooltip per cost/effect/variable.
+import re
+from typing import *
+
+from .static import ChampionSpell, SpellVar, SummonerSpell
+
+Spell = Union[ChampionSpell, SummonerSpell]
+
+SPELL_SCALINGS = {'attackdamage': "AD", 'bonusattackdamage': "**bonus** AD",
+                  'armor': "Armor", 'bonusarmor': "**bonus** Armor",
+                  'spellblock': "Magic Resist", 'bonusspellblock': "**bonus** Magic Resist",
+                  'health': "Health", 'bonushealth': "**bonus** Health",
+                  'spelldamage': "AP", "@dynamic.abilitypower": "AP"}
+# unhandled special cases: (i have been unable to find out what these mean, api missing too much data :/)
+# @dynamic.attackdamage @cooldownchampion
+
+_PLACEHOLDER = re.compile(r"\{\{ ([^{}]*?) \}\}")
+_EFFECT = re.compile(r"e(0|[1-9][0-9]*)")
+
+
+def _burns(spell: Spell) -> Tuple[str, Sequence[str]]:
+    if spell.cost_burn is not None and spell.effect_burn is not None:
+        return spell.cost_burn, spell.effect_burn
+    return "?", "?"
+
+
+def format_var(spell: Spell, var: SpellVar) -> str:
+    """What a spell variable's placeholder gets replaced with.
+    """
+    if var.link in SPELL_SCALINGS:
+        vals = '/'.join(f'{coeff * 100:g}' for coeff in var.coefficients)
+        return f"{vals}% {SPELL_SCALINGS[var.link]}"
+    elif var.link == "@player.level":
+        return f"{var.coefficients[0]:g}-{var.coefficients[-1]:g} (based on level)"
+    elif var.link == "@text":
+        return '/'.join(f'{coeff:g}' for coeff in var.coefficients)
+    elif var.link == "@stacks":
+        return f"{spell.name} stacks"
+    elif var.link == "@special.viw":
+        return f"1% per {'/'.join(f'{coeff:g}' for coeff in var.coefficients)} **Bonus** AD"
+    elif var.link in {"@special.jaxrarmor", "@special.jaxrmr", "@special.BraumWArmor", "@special.BraumWMR"}:
+        # idk why the spell tooltips even have these variables. the actual numbers are static inside the text...
+        return "bonus"
+    elif var.link == "@special.nautilusq":
+        return ""
+    return f"{var.coefficients} {var.link}"
+
+
+class Cost(NamedTuple):
+    def render(self, spell: Spell) -> str:
+        return _burns(spell)[0]
+
+
+class Effect(NamedTuple):
+    index: int
+
+    def render(self, spell: Spell) -> str:
+        return _burns(spell)[1][self.index]
+
+
+class Var(NamedTuple):
+    var: SpellVar
+
+    def render(self, spell: Spell) -> str:
+        return format_var(spell, self.var)
+
+
+Placeholder = Union[Cost, Effect, Var]
+
+
+class Template(NamedTuple):
+    # always one more literal than placeholders, the output is literals[0] + placeholders[0] + literals[1] + ...
+    literals: Tuple[str, ...]
+    placeholders: Tuple[Placeholder, ...]
+
+    def render(self, spell: Spell) -> str:
+        parts: List[str] = [self.literals[0]]
+        for placeholder, literal in zip(self.placeholders, self.literals[1:]):
+            parts.append(placeholder.render(spell))
+            parts.append(literal)
+        return ''.join(parts)
+
+
+def _resolve(spell: Spell, name: str) -> Optional[Placeholder]:
+    # same precedence the old replace loop had: cost, then effects, then the first variable with the key
+    if name == "cost":
+        return Cost()
+    match = _EFFECT.fullmatch(name)
+    if match and int(match.group(1)) < len(_burns(spell)[1]):
+        return Effect(int(match.group(1)))
+    for var in spell.variables:
+        if var.key == name:
+            return Var(var)
+    return None
+
+
+def compile_tooltip(spell: Spell, tooltip: str) -> Template:
+    """Split a tooltip into literal text and the placeholders the spell has values for.
+    Placeholders it doesn't know are left in the text as-is.
+
+    Args:
+        spell: The spell the tooltip belongs to.
+        tooltip: The tooltip to compile.
+
+    Returns:
+        Template: the compiled tooltip.
+    """
+    literals: List[str] = []
+    placeholders: List[Placeholder] = []
+    start = 0
+    for match in _PLACEHOLDER.finditer(tooltip):
+        placeholder = _resolve(spell, match.group(1))
+        if placeholder is None:
+            continue
+        literals.append(tooltip[start:match.start()])
+        placeholders.append(placeholder)
+        start = match.end()
+    literals.append(tooltip[start:])
+    return Template(tuple(literals), tuple(placeholders))
@@ -1,19 +1,23 @@
 import asyncio
-import operator
+import io
+import json
+import logging
+import os
 import textwrap
 import time
-from collections import defaultdict
-from contextlib import contextmanager
 from typing import *
 
 import discord
-import cassiopeia as riotapi
-from cassiopeia.core.staticdata import *
-from cassiopeia.core.staticdata.champion import ChampionSpell, Passive
 from discord.ext import commands
 
-from . import db, questions, util, config
-from .util import find_in_data
+from . import db, questions, scores, static, util, config
+from .cache import LRUCache
+from .games import GameRegistry
+from .metrics import METRICS, STARTUP, send
+from .static import Champion, ChampionSpell, Item, Passive, Rune, SummonerSpell
+from .timers import TimerWheel
+
+logger = logging.getLogger(__name__)
 
 
 def spell_info(champ: Champion, spell_key: str) -> discord.Embed:
@@ -22,16 +26,16 @@ def spell_info(champ: Champion, spell_key: str) -> discord.Embed:
     champ_name_link = champ.name.replace(' ', '_')
     url_anchored = f"{champ_name_link}#{spell.name.replace(' ', '_')}"
     embed = discord.Embed(title=f"{spell.name} ({spell_key.upper()})",
-                          description=f"{find_in_data(spell, 'costBurn')} {{{{ resource_type }}}}",
+                          description=f"{spell.cost_burn} {{{{ resource_type }}}}",
                           url=f"http://leagueoflegends.wikia.com/wiki/{url_anchored}",
                           type="rich", color=discord.Color.blue())
     embed.set_author(name=f"{champ.name}", icon_url=util.get_image_link(champ.image),
                      url=f"http://leagueoflegends.wikia.com/wiki/{champ_name_link}")
-    embed.set_thumbnail(url=util.get_image_link(spell.image_info))
+    embed.set_thumbnail(url=util.get_image_link(spell.image))
 
-    embed.add_field(name="Cooldown", value=find_in_data(spell, "cooldownBurn"))
-    embed.add_field(name="Range", value=find_in_data(spell, "rangeBurn"))
-    embed.add_field(name="Tooltip", value=util.SANITIZER.handle(util.parse_tooltip(spell, spell.tooltip)),
+    embed.add_field(name="Cooldown", value=spell.cooldown_burn)
+    embed.add_field(name="Range", value=spell.range_burn)
+    embed.add_field(name="Tooltip", value=util.get_text("spell", f"{champ.id}{spell.keyboard_key}", "tooltip"),
                     inline=False)
     return embed
 
@@ -42,12 +46,12 @@ def passive_info(champ: Champion) -> discord.Embed:
     champ_name_link = champ.name.replace(' ', '_')
     url_anchored = f"{champ_name_link}#{passive.name.replace(' ', '_')}"
     embed = discord.Embed(title=f"{passive.name} (Passive)",
-                          description=util.SANITIZER.handle(passive.description),
+                          description=util.get_text("passive", champ.id, "description"),
                           url=f"http://leagueoflegends.wikia.com/wiki/{url_anchored}",
                           type="rich", color=discord.Color.blue())
     embed.set_author(name=f"{champ.name}", icon_url=util.get_image_link(champ.image),
                      url=f"http://leagueoflegends.wikia.com/wiki/{champ_name_link}")
-    embed.set_thumbnail(url=util.get_image_link(passive.image_info))
+    embed.set_thumbnail(url=util.get_image_link(passive.image))
 
     return embed
 
@@ -74,7 +78,7 @@ def skin_info(info: util.SkinInfo, type: str=None) -> discord.Embed:
 
 def item_info(item: Item) -> discord.Embed:
     embed = discord.Embed(title=f"{item.name}",
-                          description=util.SANITIZER.handle(item.description),
+                          description=util.get_text("item", item.id, "description"),
                           url=f"http://leagueoflegends.wikia.com/wiki/{item.name.replace(' ', '_')}",
                           type="rich", color=discord.Color.blue())
     embed.set_thumbnail(url=util.get_image_link(item.image))
@@ -86,31 +90,31 @@ def item_info(item: Item) -> discord.Embed:
         embed.add_field(name="Gold (Recipe)", value=f"{item.gold.base}g")
     # embed.add_field(name="Purchasable?", value="Yes" if item.gold.purchasable else "No")
     if item.builds_from:
-        embed.add_field(name="Builds From", value=', '.join(x.name for x in item.builds_from))
+        embed.add_field(name="Builds From", value=', '.join(util.DATA.items[x].name for x in item.builds_from))
     if item.builds_into:
-        embed.add_field(name="Builds Into", value=', '.join(x.name for x in item.builds_into))
+        embed.add_field(name="Builds Into", value=', '.join(util.DATA.items[x].name for x in item.builds_into))
     return embed
 
 
 def summ_info(summ: SummonerSpell) -> discord.Embed:
-    embed = discord.Embed(title=summ.name, description=f"Available at summoner level {find_in_data(summ, 'summonerLevel')}",
+    embed = discord.Embed(title=summ.name, description=f"Available at summoner level {summ.summoner_level}",
                           url=f"http://leagueoflegends.wikia.com/wiki/{summ.name.replace(' ', '_')}",
                           type="rich", color=discord.Color.blue())
     embed.set_thumbnail(url=util.get_image_link(summ.image))
-    embed.add_field(name="Cooldown", value=find_in_data(summ, "cooldownBurn"))
-    embed.add_field(name="Range", value=find_in_data(summ, "rangeBurn"))
-    embed.add_field(name="Tooltip", value=util.SANITIZER.handle(util.parse_tooltip(summ, summ.tooltip)),
+    embed.add_field(name="Cooldown", value=summ.cooldown_burn)
+    embed.add_field(name="Range", value=summ.range_burn)
+    embed.add_field(name="Tooltip", value=util.get_text("summoner_spell", summ.id, "tooltip"),
                     inline=False)
     return embed
 
 
 def rune_info(rune: Rune) -> discord.Embed:
     embed = discord.Embed(title=rune.name,
-                          description=f"{rune.path.value}: {util.RUNE_TIER_NAMES[rune.path][rune.tier]}",
+                          description=f"{rune.path}: {util.RUNE_TIER_NAMES[rune.path][rune.tier]}",
                           url=f"http://leagueoflegends.wikia.com/wiki/{rune.name.replace(' ', '_')}",
                           type="rich", color=discord.Color.blue())
-    embed.set_thumbnail(url=rune.image.url)
-    embed.add_field(name="Description", value=util.SANITIZER.handle(rune.long_description),
+    embed.set_thumbnail(url=rune.image_url)
+    embed.add_field(name="Description", value=util.get_text("rune", rune.id, "long_description"),
                     inline=False)
     return embed
 
@@ -140,9 +144,50 @@ def champ_info(champ: Champion, spell_key: str) -> discord.Embed:
 class LoLTrivia(object):
     def __init__(self, client: commands.Bot):
         self.client = client
-        self.questions: DefaultDict[discord.TextChannel, Dict[questions.Question, asyncio.Task]] = defaultdict(dict)
+        self.games: GameRegistry = GameRegistry()
         # self.timers: Dict[discord.Channel, float] = defaultdict(float)
-        self.user_db = db.TriviaDB("data/users.db")
+        db_config: dict = config.get("db", {})
+        if db_config.get("service"):
+            # shared with other bot processes through the score service (see scores.py)
+            self.user_db = scores.ScoreClient(db_config["service"], client_id=db_config.get("client_id"),
+                                              loop=self.client.loop)
+        else:
+            self.user_db = db.AsyncTriviaDB(db_config.get("file", "data/users.db"),
+                                            write_behind=db_config.get("write_behind", False),
+                                            flush_size=db_config.get("flush_size", 100),
+                                            flush_interval=db_config.get("flush_interval", 5.0))
+        self.sampler: questions.QuestionSampler = questions.QuestionSampler(
+            config["trivia"].get("question_weights"), config["trivia"].get("no_repeat", 20))
+        self.pool: questions.QuestionPool = questions.QuestionPool(config["trivia"].get("pool_size", 3), self.sampler)
+        # started by warm_up once there's static data to make questions from
+        self.pool_task: Optional[asyncio.Task] = None
+        # expires every channel's questions, see question_expired
+        self.timers: TimerWheel = TimerWheel(config["trivia"].get("timer_tick", 0.25))
+        self.timer_task: asyncio.Task = self.client.loop.create_task(self.timers.run())
+        self.flush_task: Optional[asyncio.Task] = None
+        if self.user_db.write_behind:
+            # make sure queued scores get written even if nobody answers for a while
+            self.flush_task = self.client.loop.create_task(self.flush_scores())
+        # rendered info embeds as dicts, by (kind, entity id, sub key, data version). footers are added per message
+        self.embeds: LRUCache[Tuple[str, Any, str, str], dict] = \
+            LRUCache(config["trivia"].get("embed_cache_size", 512), name="embeds")
+
+        # the static data is loaded after logging in, commands that need it say so until then (see warming_up)
+        self.ready: asyncio.Event = asyncio.Event()
+        self.warm_task: asyncio.Task = self.client.loop.create_task(self.warm_up())
+
+        # newer static data gets loaded and warmed in the background, then swapped in (see reload_data)
+        self.reload_lock: asyncio.Lock = asyncio.Lock()
+        self.data_mtime: Optional[float] = None
+        self.reload_task: Optional[asyncio.Task] = None
+        if config.get("reload_interval"):
+            self.reload_task = self.client.loop.create_task(self.watch_data(config["reload_interval"]))
+
+        metrics_config: dict = config.get("metrics", {})
+        self.metrics_task: Optional[asyncio.Task] = None
+        if metrics_config.get("file"):
+            self.metrics_task = self.client.loop.create_task(
+                self.write_metrics(metrics_config["file"], metrics_config.get("interval", 60)))
 
         # add the force_index acceptable values to the !trivia force command.
         force_help = ['\n']
@@ -151,6 +196,70 @@ class LoLTrivia(object):
         self.force.help += '\n'.join(force_help)
         self.trivia.help = self.trivia.help.format(max=config["trivia"]["max_games"])
 
+    def info_embed(self, kind: str, entity: Any, arg: str="") -> discord.Embed:
+        """Gets the info embed for a champion/item/skin/summoner spell/rune, from the cache if it's been rendered before.
+
+        Args:
+            kind: The kind of entity (one of `util.ENTITY_KINDS`).
+            entity: The champion/item/skin/summoner spell/rune.
+            arg: The extra argument of the info command (champion spell key or skin type).
+
+        Returns:
+            discord.Embed: a new embed, safe to add a footer to.
+        """
+        arg = arg.lower()
+        if kind == "champion":
+            entity_id, sub_key = entity.id, arg if arg in ('p', 'q', 'w', 'e', 'r') else ""
+            build = lambda: champ_info(entity, sub_key)
+        elif kind == "skin":
+            entity_id, sub_key = entity.skin.id, arg if arg == "loading" else ""
+            build = lambda: skin_info(entity, sub_key)
+        else:
+            entity_id, sub_key = entity.id, ""
+            builder = {"item": item_info, "summoner_spell": summ_info, "rune": rune_info}[kind]
+            build = lambda: builder(entity)
+
+        payload = self.embeds.get((kind, entity_id, sub_key, util.DATA.version), lambda: build().to_dict())
+        return discord.Embed.from_dict(payload)
+
+    async def warm_up(self, retry_interval: float=60.0):
+        """Loads the static data and builds everything derived from it on a worker thread once logged in,
+        then starts making questions. Tries again every `retry_interval` seconds if that fails.
+        """
+        with STARTUP.phase("login"):
+            await self.client.wait_until_ready()
+
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                data = await loop.run_in_executor(None, util.load)
+                break
+            except Exception:
+                logger.exception(f"Couldn't load the static data, trying again in {retry_interval:.0f}s")
+                await asyncio.sleep(retry_interval)
+
+        # preloaded already if the launcher forked us
+        if util.DATA is not data:
+            util.swap(data)
+        self.data_mtime = self.snapshot_mtime()
+        self.pool_task = self.client.loop.create_task(self.pool.fill())
+        self.ready.set()
+        STARTUP.finish()
+        logger.info("Warmed up:\n" + '\n'.join(STARTUP.summary()))
+
+    async def warming_up(self, ctx: commands.Context) -> bool:
+        """Tells `ctx` to try again in a bit if the static data isn't loaded yet (and gives back its cooldown).
+
+        Returns:
+            bool: whether it's still warming up.
+        """
+        if self.ready.is_set():
+            return False
+        if ctx.command:
+            ctx.command.reset_cooldown(ctx)
+        await send(ctx, "LoL Trivia is still warming up, try again in a bit.")
+        return True
+
     @commands.cooldown(rate=1, per=config["trivia"]["cd"], type=commands.BucketType.guild)
     @commands.group(invoke_without_command=True)
     async def trivia(self, ctx: commands.Context, num: int=1):
@@ -160,7 +269,7 @@ class LoLTrivia(object):
         """
         # if time.time() - self.timers[ctx.message.channel] < config["trivia_cd"]: return
         # self.timers[ctx.message.channel] = time.time()
-        if self.questions[ctx.message.channel]: return
+        if ctx.message.channel in self.games: return
 
         if discord.utils.get(ctx.me.roles, name="DisableTrivia") is not None: return
 
@@ -184,50 +293,26 @@ class LoLTrivia(object):
         If [force_index] is specified, that specific question type will be played.
         """
         # if not ctx.message.author.permissions_in(ctx.message.channel).manage_messages: return
-        self.questions[ctx.message.channel].pop(running, None)
-
-        for q, task in list(self.questions[ctx.message.channel].items()):
-            self.questions[ctx.message.channel].pop(q, None)
-            if not q: continue
-            task.cancel()
+        self.games.end(ctx.message.channel)
 
     @trivia.command()
     async def info(self, ctx: commands.Context, arg1: str, arg2: str=""):
         """Returns info on a champ/item/skin/summ/rune/mastery (best guess).
         """
-        # messy and often slow but im too lazy to fix
-        if self.questions[ctx.message.channel]:
+        if ctx.message.channel in self.games:
+            return
+        if await self.warming_up(ctx):
             return
 
         start: float = time.time()
-        embed: discord.Embed = None
-
-        items: List[Tuple[Any, int]] = [
-            util.get_champion_by_name(arg1),
-            util.get_item(arg1),
-            util.get_skin_by_name(arg1),
-            util.get_by_name(arg1, riotapi.get_summoner_spells()),
-            util.get_by_name(arg1, riotapi.get_runes()),
-        ]
-
-        info_item, score = max(items, key=operator.itemgetter(1))
-
-        if isinstance(info_item, Champion):
-            embed = champ_info(info_item, arg2)
-        elif isinstance(info_item, Item):
-            embed = item_info(info_item)
-        elif isinstance(info_item, util.SkinInfo):
-            embed = skin_info(info_item, arg2)
-        elif isinstance(info_item, SummonerSpell):
-            embed = summ_info(info_item)
-        elif isinstance(info_item, Rune):
-            embed = rune_info(info_item)
-
-        if not embed:
-            return await ctx.send("No match found.")
+
+        kind, info_item, score = util.get_entity(arg1)
+        if kind is None:
+            return await send(ctx, "No match found.")
+        embed = self.info_embed(kind, info_item, arg2)
 
         footer = f"Time elapsed: {(time.time() - start) * 1000:.0f} ms/Match Score: {score}"
-        await ctx.send(embed=embed.set_footer(text=footer))
+        await send(ctx, embed=embed.set_footer(text=footer))
 
     @trivia.command()
     async def champ(self, ctx: commands.Context, champ_name: str, spell_key: str= ""):
@@ -236,25 +321,29 @@ class LoLTrivia(object):
         Additionally, [spell_name] can be specified as one of "Q", "W", "E", "R", "P",
             returning specific info about that spell.
         """
-        if self.questions[ctx.message.channel]:
+        if ctx.message.channel in self.games:
+            return
+        if await self.warming_up(ctx):
             return
 
         champ, score = util.get_champion_by_name(champ_name)
         if not champ:
-            return await ctx.send("No match found.")
-        await ctx.send(embed=champ_info(champ, spell_key).set_footer(text=f"Match Score: {score}"))
+            return await send(ctx, "No match found.")
+        await send(ctx, embed=self.info_embed("champion", champ, spell_key).set_footer(text=f"Match Score: {score}"))
 
     @trivia.command()
     async def item(self, ctx: commands.Context, *, item_name_or_id: str):
         """Returns info on a item (name, stats, gold values, etc).
         """
-        if self.questions[ctx.message.channel]:
+        if ctx.message.channel in self.games:
+            return
+        if await self.warming_up(ctx):
             return
 
         item, score = util.get_item(item_name_or_id)
         if not item:
-            return await ctx.send("No match found.")
-        await ctx.send(embed=item_info(item).set_footer(text=f"Match Score: {score}"))
+            return await send(ctx, "No match found.")
+        await send(ctx, embed=self.info_embed("item", item).set_footer(text=f"Match Score: {score}"))
 
     @trivia.command()
     async def skin(self, ctx: commands.Context, skin_name: str, type: str=""):
@@ -262,129 +351,282 @@ class LoLTrivia(object):
 
         Can specify [type] as "loading" to get loading screen slice.
         """
-        if self.questions[ctx.message.channel]:
+        if ctx.message.channel in self.games:
+            return
+        if await self.warming_up(ctx):
             return
 
         skin, score = util.get_skin_by_name(skin_name)
         if not skin:
-            return await ctx.send("No match found.")
-        await ctx.send(embed=skin_info(skin, type).set_footer(text=f"Match Score: {score}"))
+            return await send(ctx, "No match found.")
+        await send(ctx, embed=self.info_embed("skin", skin, type).set_footer(text=f"Match Score: {score}"))
 
     @trivia.command()
     async def summ(self, ctx: commands.Context, *, summ_name: str):
         """Returns info on a summoner spell (name, cooldown, required level, tooltip).
         """
-        if self.questions[ctx.message.channel]:
+        if ctx.message.channel in self.games:
+            return
+        if await self.warming_up(ctx):
             return
 
-        summ, score = util.get_by_name(summ_name, riotapi.get_summoner_spells())
+        summ, score = util.get_summoner_spell(summ_name)
         if not summ:
-            return await ctx.send("No match found.")
-        await ctx.send(embed=summ_info(summ).set_footer(text=f"Match Score: {score}"))
+            return await send(ctx, "No match found.")
+        await send(ctx, embed=self.info_embed("summoner_spell", summ).set_footer(text=f"Match Score: {score}"))
 
     @trivia.command()
     async def rune(self, ctx: commands.Context, *, rune_name: str):
         """Returns info on a rune (name, tier, description).
         """
-        if self.questions[ctx.message.channel]:
+        if ctx.message.channel in self.games:
+            return
+        if await self.warming_up(ctx):
             return
 
-        rune, score = util.get_by_name(rune_name, riotapi.get_runes())
+        rune, score = util.get_rune(rune_name)
         if not rune:
-            return await ctx.send("No match found.")
-        await ctx.send(embed=rune_info(rune).set_footer(text=f"Match Score: {score}"))
+            return await send(ctx, "No match found.")
+        await send(ctx, embed=self.info_embed("rune", rune).set_footer(text=f"Match Score: {score}"))
 
     # @trivia.command()
     # async def mastery(self, ctx: commands.Context, *, mastery_name: str):
     #     """Returns info on a mastery (name, tree, description).
     #     """
-    #     if self.questions[ctx.message.channel]:
+    #     if ctx.message.channel in self.games:
     #         return
     #
     #     mastery, score = util.get_by_name(mastery_name, riotapi.get_masteries())
     #     if not mastery:
-    #         return await ctx.send("No match found.")
-    #     await ctx.send(embed=self.mastery_info(mastery).set_footer(text=f"Match Score: {score}"))
+    #         return await send(ctx, "No match found.")
+    #     await send(ctx, embed=self.mastery_info(mastery).set_footer(text=f"Match Score: {score}"))
 
     @trivia.command()
     async def score(self, ctx: commands.Context, *, user: discord.Member=None):
-        """Returns the score of [user]. Defaults to you.
+        """Returns the score of [user] (overall and on this server). Defaults to you.
         """
-        points = self.user_db.get_score(user.id if user else ctx.message.author.id) or 0
+        discord_id = user.id if user else ctx.message.author.id
+        points = await self.user_db.get_score(discord_id) or 0
+        here = ""
+        if ctx.guild:
+            here = f" ({await self.user_db.get_score(discord_id, ctx.guild.id) or 0} on this server)"
         if user is None:
-            await ctx.send(f"{ctx.author.mention}, your score is {points} points.")
+            await send(ctx, f"{ctx.author.mention}, your score is {points} points{here}.")
         else:
-            await ctx.send(f"{user.mention}'s score is {points} points")
+            await send(ctx, f"{user.mention}'s score is {points} points{here}")
 
     @trivia.command()
-    async def top(self, ctx: commands.Context):
+    async def top(self, ctx: commands.Context, scope: str=""):
         """Returns the top 10 scores
+
+        Specify [scope] as "server" to only count points scored on this server.
         """
-        embed = discord.Embed(title=f"LoL Trivia Scoreboard", description="Top 10 LoL Trivia players\n\n",
+        guild_id = ctx.guild.id if ctx.guild and scope.lower() in ("server", "guild", "here") else None
+        embed = discord.Embed(title=f"LoL Trivia Scoreboard",
+                              description=f"Top 10 LoL Trivia players{' on this server' if guild_id else ''}\n\n",
                               type="rich", color=discord.Color.blue())
-        for x, (discord_id, score, name) in enumerate(self.user_db.get_top(), start=1):
+        for x, (discord_id, score, name) in enumerate(await self.user_db.get_top(guild_id=guild_id), start=1):
             if not name:
-                user = ctx.guild.get_member(discord_id) or self.client.get_user(discord_id)
+                user = (ctx.guild and ctx.guild.get_member(discord_id)) or self.client.get_user(discord_id)
                 name = f"{user.name}#{user.discriminator}" if user else discord_id
+                if user:
+                    await self.user_db.cache_name(discord_id, name)
             embed.add_field(name=f"{x}. {name}", value=f"{score} points")
-        await ctx.send(embed=embed)
+        await send(ctx, embed=embed)
+
+    @trivia.command()
+    async def rank(self, ctx: commands.Context, *, user: discord.Member=None):
+        """Returns the rank of [user] (overall and on this server). Defaults to you.
+        """
+        discord_id = user.id if user else ctx.message.author.id
+        rank = await self.user_db.get_rank(discord_id)
+        who = f"{ctx.author.mention}, you are" if user is None else f"{user.mention} is"
+        if rank is None:
+            return await send(ctx, f"{who} not ranked yet.")
+
+        here = ""
+        guild_rank = await self.user_db.get_rank(discord_id, ctx.guild.id) if ctx.guild else None
+        if guild_rank:
+            here = f" (#{guild_rank[0]} on this server with {guild_rank[1]} points)"
+        await send(ctx, f"{who} rank #{rank[0]} with {rank[1]} points{here}.")
+
+    @trivia.command(hidden=True)
+    @commands.is_owner()
+    async def metrics(self, ctx: commands.Context, fmt: str=""):
+        """Shows command/question/db/send latencies and counters.
+
+        Specify [fmt] as "json" or "prometheus" to get them as a file instead.
+        """
+        if fmt.lower() in ("json", "prometheus"):
+            data = json.dumps(METRICS.to_json(), indent=2) if fmt.lower() == "json" else METRICS.to_prometheus()
+            name = "metrics.json" if fmt.lower() == "json" else "metrics.prom"
+            return await send(ctx, file=discord.File(io.BytesIO(data.encode()), name))
+
+        # split into code blocks under the 2000 character message limit
+        summary = '\n'.join(METRICS.summary())
+        for x in range(0, len(summary), 1900):
+            await send(ctx, f"```\n{summary[x:x + 1900]}\n```")
+
+    @trivia.command(hidden=True)
+    @commands.is_owner()
+    async def reload(self, ctx: commands.Context, compile: str=""):
+        """Loads the static data snapshot again if it's a new version, without dropping running games.
+
+        Specify [compile] as "compile" to compile a new snapshot from the Riot API first.
+        """
+        if await self.warming_up(ctx):
+            return
+        await send(ctx, "Loading static data...")
+        try:
+            old, new = await self.reload_data(compile.lower() == "compile")
+        except Exception as e:
+            logger.exception("Couldn't reload the static data")
+            return await send(ctx, f"Reload failed, still on {util.DATA.version}: {e!r}")
+        await send(ctx, f"Already on {new}." if old == new else f"Swapped static data {old} -> {new}.")
+
+    @trivia.command(hidden=True)
+    @commands.is_owner()
+    async def startup(self, ctx: commands.Context):
+        """Shows how long each phase of starting up took (imports, loading the static data, building indexes).
+        """
+        await send(ctx, "```\n" + '\n'.join(STARTUP.summary()) + "\n```")
+
+    def snapshot_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(config.get("static_data", "data/static.json"))
+        except OSError:
+            return None
+
+    async def reload_data(self, compile: bool=False) -> Tuple[str, str]:
+        """Loads the static data snapshot and everything derived from it on a worker thread, then swaps it in
+        if it's a different version. Questions already asked finish with the version they were made from.
+
+        Args:
+            compile: Compile a new snapshot from the Riot API first.
+
+        Returns:
+            Tuple[str, str]: the old and new versions (the same if nothing changed).
+        """
+        async with self.reload_lock:
+            loop = asyncio.get_event_loop()
+            path = config.get("static_data", "data/static.json")
+            if compile:
+                await loop.run_in_executor(None, static.compile_snapshot, config, path)
+            self.data_mtime = self.snapshot_mtime()
+            data = await loop.run_in_executor(None, static.StaticData.from_file, path)
+            if data.version == util.DATA.version:
+                return data.version, data.version
+
+            start = time.perf_counter()
+            await loop.run_in_executor(None, data.warm)
+            # no awaits from here on, everything switches versions at once
+            old = util.swap(data)
+            self.pool.clear()
+            self.embeds.clear()
+            logger.info(f"Swapped static data {old.version} -> {data.version} "
+                        f"(built in {time.perf_counter() - start:.2f}s)")
+            return old.version, data.version
+
+    async def watch_data(self, interval: float):
+        await self.ready.wait()
+        while True:
+            await asyncio.sleep(interval)
+            if self.snapshot_mtime() == self.data_mtime:
+                continue
+            try:
+                await self.reload_data()
+            except Exception:
+                logger.exception("Couldn't reload the static data")
 
     async def start_trivia(self, ctx: commands.Context, num: int=1, force_index: int=None):
+        if await self.warming_up(ctx):
+            return
         num = max(1, min(num, config["trivia"]["max_games"]))
 
-        await ctx.send(f"{ctx.message.author.mention} started a game of LoL Trivia! Get ready!")
+        await send(ctx, f"{ctx.message.author.mention} started a game of LoL Trivia! Get ready!")
 
-        with self.lock_questions(ctx.message.channel):
+        with self.games.play(ctx.message.channel) as game:
             for x in range(num):
-                if not self.questions[ctx.message.channel].get(running, None):
+                if not game.running:
                     break
                 await asyncio.sleep(2)
-                q: questions.Question = questions.get_random_question(force_index)
+                q: questions.Question = self.pool.get(ctx.message.channel.id, force_index)
                 try:
                     await q.say(ctx.message.channel)
                 except:
                     pass
-                task = asyncio.ensure_future(self.question_helper(q, ctx.message.channel))
-                self.questions[ctx.message.channel][q] = task
-                await task
+                timer = self.timers.schedule(config["trivia"]["game_length"], self.question_expired,
+                                             q, ctx.message.channel)
+                game.questions[q] = timer
+                await timer.done
 
-        await ctx.send(f"You can start a new round in {config['trivia']['cd']} seconds.")
+        await send(ctx, f"You can start a new round in {config['trivia']['cd']} seconds.")
 
-    async def question_helper(self, q: questions.Question, channel: discord.TextChannel):
-        try:
-            await asyncio.sleep(config["trivia"]["game_length"])
-            await q.expire(channel)
-            self.questions[channel].pop(q, None)
-        except asyncio.CancelledError:
-            pass
+    async def question_expired(self, q: questions.Question, channel: discord.TextChannel):
+        # answered while its tick was on the way
+        if not q: return
+        await q.expire(channel)
+        game = self.games.get(channel)
+        if game:
+            game.questions.pop(q, None)
 
     async def on_message(self, message: discord.Message):
         if message.author == self.client.user:
             return
-        if not self.questions[message.channel]:
+        game = self.games.get(message.channel)
+        if game is None:
             return
 
-        for q, task in list(self.questions[message.channel].items()):
+        # only messages in channels with a game get timed, everything else returns above untouched
+        start = time.perf_counter()
+        for q, timer in list(game.questions.items()):
             if not q: continue
 
             points = await q.answer(message, self.user_db.get_score)
             if points:
+                METRICS.inc("answers", "correct")
                 user = message.author
-                self.user_db.add_score(user.id, points, f"{user.name}#{user.discriminator}")
-                task.cancel()
-                self.questions[message.channel].pop(q, None)
+                await self.user_db.add_score(user.id, points, f"{user.name}#{user.discriminator}",
+                                             message.guild.id if message.guild else None)
+                timer.cancel()
+                game.questions.pop(q, None)
+        METRICS.observe("on_message", "answer_check", time.perf_counter() - start)
+
+    async def flush_scores(self):
+        while True:
+            await asyncio.sleep(self.user_db.flush_interval)
+            await self.user_db.flush()
+
+    async def write_metrics(self, path: str, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                METRICS.write(path)
+            except OSError:
+                logger.exception(f"Couldn't write metrics to '{path}'")
+
+    async def __before_invoke(self, ctx: commands.Context):
+        ctx.metrics_start = time.perf_counter()
+
+    async def __after_invoke(self, ctx: commands.Context):
+        name = ctx.command.qualified_name
+        METRICS.observe("command", name, time.perf_counter() - ctx.metrics_start)
+        if ctx.command_failed:
+            METRICS.inc("command_errors", name)
+
+    def __unload(self):
+        self.warm_task.cancel()
+        if self.pool_task:
+            self.pool_task.cancel()
+        self.timer_task.cancel()
+        self.timers.clear()
+        if self.reload_task:
+            self.reload_task.cancel()
+        if self.flush_task:
+            self.flush_task.cancel()
+        if self.metrics_task:
+            self.metrics_task.cancel()
+        self.user_db.close()
 
     async def on_ready(self):
         await self.client.change_presence(activity=discord.Game(name="Use !trivia to play."))
-
-    @contextmanager
-    def lock_questions(self, channel):
-        # dummy input to prevent the question queue from being empty when needed (allowing for !trivia spam)
-        self.questions[channel][running] = True
-        try:
-            yield
-        finally:
-            self.questions[channel].pop(running, None)
-
-
-running = bool()  # its just a dummy value
@@ -1,55 +1,31 @@
 # messy shit dont read please
-import json
+import logging
+import time
 from typing import *
 
-import html2text
-import cassiopeia as riotapi
-from cassiopeia.core.staticdata import *
-from cassiopeia.core.staticdata.champion import ChampionSpell, Skin
-from cassiopeia.core.staticdata.common import Image
-from cassiopeia.core.staticdata.rune import RunePath
-from fuzzywuzzy import process
+from . import static, text, config
+from .metrics import STARTUP
+from .search import SearchIndex
+from .static import Champion, ChampionSpell, Image, Item, Rune, SkinInfo, SummonerSpell
+from .tooltip import SPELL_SCALINGS, Template, compile_tooltip
 
-DDRAGON_BASE = f"http://ddragon.leagueoflegends.com/cdn/{riotapi.get_versions()[0]}"
+# the current static data, None until it's been loaded (see load and swap)
+DATA: Optional[static.StaticData] = None
+DDRAGON_BASE = ""
 
-SPELL_SCALINGS = {'attackdamage': "AD", 'bonusattackdamage': "**bonus** AD",
-                  'armor': "Armor", 'bonusarmor': "**bonus** Armor",
-                  'spellblock': "Magic Resist", 'bonusspellblock': "**bonus** Magic Resist",
-                  'health': "Health", 'bonushealth': "**bonus** Health",
-                  'spelldamage': "AP", "@dynamic.abilitypower": "AP"}
-# unhandled special cases: (i have been unable to find out what these mean, api missing too much data :/)
-# @dynamic.attackdamage @cooldownchampion
+logger = logging.getLogger(__name__)
 
-SANITIZER = html2text.HTML2Text()
-SANITIZER.ignore_links = True
-SANITIZER.body_width = 0
+ENTITY_KINDS = ("champion", "item", "skin", "summoner_spell", "rune")
 
 RUNE_TIER_NAMES = {
-    RunePath.precision: ["Keystone", "Heroism", "Legend", "Combat"],
-    RunePath.domination: ["Keystone", "Malice", "Tracking", "Hunter"],
-    RunePath.sorcery: ["Keystone", "Artifact", "Excellence", "Power"],
-    RunePath.resolve: ["Keystone", "Strength", "Resistance", "Vitality"],
-    RunePath.inspiration: ["Keystone", "Contraption", "Tomorrow", "Beyond"]
+    "Precision": ["Keystone", "Heroism", "Legend", "Combat"],
+    "Domination": ["Keystone", "Malice", "Tracking", "Hunter"],
+    "Sorcery": ["Keystone", "Artifact", "Excellence", "Power"],
+    "Resolve": ["Keystone", "Strength", "Resistance", "Vitality"],
+    "Inspiration": ["Keystone", "Contraption", "Tomorrow", "Beyond"]
 }
 
 
-class SkinInfo(NamedTuple):
-    champ: Champion
-    skin: Skin
-    price: int
-    currency: str
-    date: str
-
-
-# A lot of cass static data missing fields and bugs :(
-def find_in_data(obj, name):
-    for dto in obj._data.values():
-        try:
-            return getattr(dto, name)
-        except AttributeError:
-            continue
-
-
 def get_champion_by_name(name: str) -> Tuple[Optional[Champion], int]:
     """Get a champion by name with fuzzy search.
     Args:
@@ -58,7 +34,7 @@ def get_champion_by_name(name: str) -> Tuple[Optional[Champion], int]:
     Returns:
         Tuple[Optional[Champion], int]: Second element represents the query score (how close it is to the actual value).
     """
-    return get_by_name(name, riotapi.get_champions())
+    return _champion_index(DATA).search(name)
 
 
 def get_item(name_or_id: Union[str, int]) -> Tuple[Optional[Item], int]:
@@ -69,12 +45,55 @@ def get_item(name_or_id: Union[str, int]) -> Tuple[Optional[Item], int]:
     Returns:
         Tuple[Optional[Item], int]: Second element represents the query score (how close it is to the actual value).
     """
-    items = riotapi.get_items()
     try:
-        item = items[int(name_or_id)]
+        item = DATA.items[int(name_or_id)]
         return item, 100 if item else 0
     except (TypeError, KeyError, ValueError):
-        return get_by_name(name_or_id, items)
+        return _item_index(DATA).search(name_or_id)
+
+
+def get_summoner_spell(name: str) -> Tuple[Optional[SummonerSpell], int]:
+    """Get a summoner spell by name with fuzzy search.
+    Args:
+        name: Name of summoner spell
+
+    Returns:
+        Tuple[Optional[SummonerSpell], int]: Second element represents the query score (how close it is to the actual value).
+    """
+    return _summoner_spell_index(DATA).search(name)
+
+
+def get_rune(name: str) -> Tuple[Optional[Rune], int]:
+    """Get a rune by name with fuzzy search.
+    Args:
+        name: Name of rune
+
+    Returns:
+        Tuple[Optional[Rune], int]: Second element represents the query score (how close it is to the actual value).
+    """
+    return _rune_index(DATA).search(name)
+
+
+def get_entity(name: str) -> Tuple[Optional[str], Any, int]:
+    """Get the best match for a name out of every champion, item, skin, summoner spell and rune at once.
+    Ties go to the kind earliest in `ENTITY_KINDS`.
+    Args:
+        name: Name of the thing (or an item id)
+
+    Returns:
+        Tuple[Optional[str], Any, int]: The kind (one of `ENTITY_KINDS`), the match and the query score.
+    """
+    match, score = _entity_index(DATA).search(name)
+    kind, entity = (match.kind, match.entity) if match else (None, None)
+    try:
+        item = DATA.items[int(name)]
+    except (TypeError, KeyError, ValueError):
+        pass
+    else:
+        # an item id is a perfect match, only a champion scoring 100 would've come before it
+        if not (score == 100 and kind == "champion"):
+            return "item", item, 100
+    return kind, entity, score
 
 
 TItem = TypeVar('TItem')
@@ -89,8 +108,8 @@ def get_by_name(name: str, items: Sequence[TItem]) -> Tuple[Optional[TItem], int
     Returns:
         Tuple[Optional[Item], int]: Second element represents the query score (how close it is to the actual value).
     """
-    res = process.extractOne(name, {item: item.name for item in items}, score_cutoff=80)
-    return (res[2], res[1]) if res else (None, 0)
+    # one-off index, prefer the prebuilt ones above for the static data
+    return SearchIndex(items, cache_size=0).search(name)
 
 
 def get_skin_by_name(name: str) -> Tuple[Optional[SkinInfo], int]:
@@ -101,8 +120,21 @@ def get_skin_by_name(name: str) -> Tuple[Optional[SkinInfo], int]:
     Returns:
         Tuple[Optional[SkinInfo], bool]: Second element represents the query score (how close it is to the actual value).
     """
-    res = process.extractOne(name, REVERSE_MAP_SKINS, score_cutoff=80)
-    return (res[2], res[1]) if res else (None, 0)
+    return _skin_index(DATA).search(name)
+
+
+def get_text(kind: str, entity_id: Union[str, int], field: str, censored: bool=False) -> str:
+    """Get sanitized (markdown) text from the text cache, see `_text_jobs` for everything in it.
+    Args:
+        kind: "champion", "spell", "passive", "item", "summoner_spell" or "rune"
+        entity_id: Id of the thing (champion id for passives, champion id + key like "266Q" for spells)
+        field: Which text of it
+        censored: Whether to get the version with its name(s) censored out
+
+    Returns:
+        str: the sanitized text.
+    """
+    return _text_cache(DATA)[_text_key(kind, entity_id, field, censored)]
 
 
 def get_image_link(image: Image) -> str:
@@ -113,73 +145,181 @@ def parse_tooltip(spell: Union[ChampionSpell, SummonerSpell], tooltip: str) -> s
     """
     Improved tooltip parser based on the built-in Cassiopeia `Spell.__replace_variables`
     """
+    cached = _tooltips(DATA).get(id(spell))
+    if cached is not None and cached.spell is spell and tooltip is spell.tooltip:
+        return cached.rendered
+    return compile_tooltip(spell, tooltip).render(spell)
 
-    for dto in spell._data.values():
-        try:
-            costs_burn = dto.costBurn
-            effects_burn = dto.effectBurn
-            break
-        except AttributeError:
-            pass
-    else:
-        costs_burn = effects_burn = "?"
 
-    tooltip = tooltip.replace("{{ cost }}", costs_burn)
+SKINS: Dict[str, SkinInfo] = {}
+REVERSE_MAP_SKINS: Dict[SkinInfo, str] = {}
+QUOTES: Dict[str, List[str]] = {}
 
-    for x, effect in enumerate(effects_burn):
-        tooltip = tooltip.replace(f"{{{{ e{x} }}}}", effect)
+_SWAP_HOOKS: List[Callable[[static.StaticData], None]] = []
+
+
+def on_swap(func: Callable[[static.StaticData], None]) -> Callable[[static.StaticData], None]:
+    """Decorator for functions to call with the new data whenever `swap` is, e.g. to update module globals.
+    Called right away too if the data is loaded already.
+    """
+    _SWAP_HOOKS.append(func)
+    if DATA is not None:
+        func(DATA)
+    return func
 
+
+def load() -> static.StaticData:
+    """Loads the static data snapshot (unless it's loaded already) and builds everything derived from it,
+    timing each step in the startup report. Doesn't make it current, pass it to `swap` for that.
+    This is the slow part of starting up (it may even compile the snapshot), the bot runs it on a worker thread
+    after logging in.
+
+    Returns:
+        static.StaticData: the static data, warm.
+    """
+    data = DATA
+    if data is None:
+        with STARTUP.phase("load static data"):
+            data = static.load(config)
+    for name, seconds in data.warm():
+        STARTUP.add(f"build {name.lstrip('_')}", seconds)
+    return data
+
+
+def swap(data: static.StaticData) -> Optional[static.StaticData]:
+    """Makes `data` the static data everything uses from now on. Warm it first, this doesn't yield to the event loop
+    so nothing ever sees half of each version. Whatever was already built from the old version (like questions being
+    asked) keeps it alive until it's done with it.
+
+    Args:
+        data: The new static data.
+
+    Returns:
+        Optional[static.StaticData]: the old static data, if there was any.
+    """
+    global DATA, DDRAGON_BASE, SKINS, REVERSE_MAP_SKINS, QUOTES
+    old = DATA
+    DATA = data
+    DDRAGON_BASE = f"http://ddragon.leagueoflegends.com/cdn/{DATA.version}"
+    SKINS = DATA.skins
+    REVERSE_MAP_SKINS = {v: k for k, v in SKINS.items()}
+    QUOTES = DATA.quotes
+    for hook in _SWAP_HOOKS:
+        hook(data)
+    return old
+
+
+# search indices, built once per data version
+@static.derived
+def _champion_index(data: static.StaticData) -> SearchIndex[Champion]:
+    return SearchIndex(data.champions)
+
+
+@static.derived
+def _item_index(data: static.StaticData) -> SearchIndex[Item]:
+    return SearchIndex(data.items.values())
+
+
+@static.derived
+def _skin_index(data: static.StaticData) -> SearchIndex[SkinInfo]:
+    names: Dict[SkinInfo, str] = {v: k for k, v in data.skins.items()}
+    return SearchIndex(names, key=names.__getitem__)
+
+
+@static.derived
+def _summoner_spell_index(data: static.StaticData) -> SearchIndex[SummonerSpell]:
+    return SearchIndex(data.summoner_spells)
+
+
+@static.derived
+def _rune_index(data: static.StaticData) -> SearchIndex[Rune]:
+    return SearchIndex(data.runes)
+
+
+class _Tooltip(NamedTuple):
+    spell: Union[ChampionSpell, SummonerSpell]
+    template: Template
+    rendered: str
+
+
+@static.derived
+def _tooltips(data: static.StaticData) -> Dict[int, _Tooltip]:
+    # by id() since hashing a whole spell costs more than rendering it, the data keeps the spells (and ids) alive
+    spells: List[Union[ChampionSpell, SummonerSpell]] = [spell for champ in data.champions for spell in champ.spells]
+    spells += data.summoner_spells
+    tooltips: Dict[int, _Tooltip] = {}
+    for spell in spells:
+        template = compile_tooltip(spell, spell.tooltip)
+        tooltips[id(spell)] = _Tooltip(spell, template, template.render(spell))
+    return tooltips
+
+
+class _Entity(NamedTuple):
+    kind: str
+    entity: Any
+    name: str
+
+
+@static.derived
+def _entity_index(data: static.StaticData) -> SearchIndex[_Entity]:
+    # same order as ENTITY_KINDS, ties go to whichever comes first
+    entities: List[_Entity] = [_Entity("champion", champ, champ.name) for champ in data.champions]
+    entities += [_Entity("item", item, item.name) for item in data.items.values()]
+    entities += [_Entity("skin", info, name) for info, name in {v: k for k, v in data.skins.items()}.items()]
+    entities += [_Entity("summoner_spell", spell, spell.name) for spell in data.summoner_spells]
+    entities += [_Entity("rune", rune, rune.name) for rune in data.runes]
+    return SearchIndex(entities)
+
+
+def _text_key(kind: str, entity_id: Union[str, int], field: str, censored: bool=False) -> str:
+    return f"{kind}:{entity_id}:{field}{':censored' if censored else ''}"
+
+
+def _text_jobs(data: static.StaticData) -> List[text.Job]:
+    jobs: List[text.Job] = []
+    tooltips = _tooltips(data)
+
+    def add(kind: str, entity_id: Union[str, int], field: str, raw: str, censor_before: Tuple[str, ...]=(),
+            censor_after: Tuple[str, ...]=()) -> None:
+        censored = bool(censor_before or censor_after)
+        jobs.append(text.Job(_text_key(kind, entity_id, field, censored), raw, censor_before, censor_after))
+
+    for champ in data.champions:
+        add("champion", champ.id, "blurb", champ.blurb, censor_after=(champ.name,))
+        add("passive", champ.id, "description", champ.passive.description)
+        add("passive", champ.id, "description", champ.passive.description, censor_before=(champ.name,))
+        for spell in champ.spells:
+            spell_id = f"{champ.id}{spell.keyboard_key}"
+            add("spell", spell_id, "description", spell.description, censor_after=(champ.name, spell.name))
+            add("spell", spell_id, "tooltip", tooltips[id(spell)].rendered)
+    for summ in data.summoner_spells:
+        tooltip = tooltips[id(summ)].rendered
+        add("summoner_spell", summ.id, "tooltip", tooltip)
+        add("summoner_spell", summ.id, "tooltip", tooltip, censor_before=(summ.name,))
+    for item in data.items.values():
+        add("item", item.id, "plaintext", item.plaintext)
+        add("item", item.id, "description", item.description)
+        add("item", item.id, "description", item.description, censor_after=(item.name,))
+    for rune in data.runes:
+        add("rune", rune.id, "long_description", rune.long_description)
+        add("rune", rune.id, "long_description", rune.long_description, censor_after=tuple(rune.name.split()))
+    return jobs
+
+
+@static.derived
+def _text_cache(data: static.StaticData) -> Dict[str, str]:
+    # html2text is slow, so everything gets rendered once here (or loaded from the last run) instead of per question
+    path: str = config.get("text_cache", "data/text_cache.json")
+    cache = text.load(path, data.version)
+    if cache is not None:
+        return cache
+
+    start = time.perf_counter()
+    jobs = _text_jobs(data)
+    cache = text.build(jobs, config.get("text_workers", 0))
+    logger.info(f"Rendered {len(jobs)} texts for version {data.version} in {time.perf_counter() - start:.2f}s")
     try:
-        variables = spell.variables
-    except:
-        # Bug in SummonerSpell.variables throws exception
-        # TODO: submit patch
-        variables = []
-
-    for var in variables:
-        if var.link in SPELL_SCALINGS:
-            vals = '/'.join(f'{coeff * 100:g}' for coeff in var.coefficients)
-            replacement = f"{vals}% {SPELL_SCALINGS[var.link]}"
-        elif var.link == "@player.level":
-            replacement = f"{var.coefficients[0]:g}-{var.coefficients[-1]:g} (based on level)"
-        elif var.link == "@text":
-            replacement = '/'.join(f'{coeff:g}' for coeff in var.coefficients)
-        elif var.link == "@stacks":
-            replacement = f"{spell.name} stacks"
-        elif var.link == "@special.viw":
-            replacement = f"1% per {'/'.join(f'{coeff:g}' for coeff in var.coefficients)} **Bonus** AD"
-        elif var.link in {"@special.jaxrarmor", "@special.jaxrmr", "@special.BraumWArmor", "@special.BraumWMR"}:
-            # idk why the spell tooltips even have these variables. the actual numbers are static inside the text...
-            replacement = "bonus"
-        elif var.link == "@special.nautilusq":
-            replacement = ""
-        else:
-            replacement = f"{var.coefficients} {var.link}"
-        tooltip = tooltip.replace(f"{{{{ {var.key} }}}}", replacement)
-
-    return tooltip
-
-
-def _load_skins() -> Dict[str, SkinInfo]:
-    with open("data/skins.json", "r") as f:
-        data: Dict[str, Tuple[str, str]] = json.load(f)
-
-    skins: Dict[str, SkinInfo] = {}
-    for champ in riotapi.get_champions():
-        for skin in champ.skins:
-            name = skin.name if skin.name != "default" else f"Classic {champ.name}"
-            price, date = data.get(str(skin.id), (None, None))
-            currency = "Gemstones" if price and price == 10 else "RP"  # SEND HELP
-            skins[name] = SkinInfo(champ, skin, price, currency, date)
-
-    return skins
-
-
-def _load_quotes() -> Dict[str, List[str]]:
-    with open("data/quotes.json", "r") as f:
-        return json.load(f)
-
-
-SKINS: Dict[str, SkinInfo] = _load_skins()
-REVERSE_MAP_SKINS = {v: k for k, v in SKINS.items()}
-QUOTES: Dict[str, List[str]] = _load_quotes()
+        text.save(path, data.version, cache)
+    except OSError:
+        logger.exception(f"Couldn't save text cache to '{path}'")
+    return cache
@@ -1,37 +1,54 @@
 #!python3
 import json
 import logging
+from typing import *
 
 from discord.ext import commands
 
 import plugins
 
-with open("config.json", "r") as f:
-    config: dict = json.load(f)
+logger = logging.getLogger('LoLTrivia')
 
-client = commands.Bot(command_prefix=commands.when_mentioned_or('!'), description="League of Legends Trivia",
-                      pm_help=False, owner_id=config["bot"]["owner_id"] or None)
 
-plugins.load_plugins(client, config)
+def load_config(path: str="config.json") -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
 
 
-@client.event
-async def on_ready():
-    logger.info(f"Logged in. User: {client.user}, ID: {client.user.id}")
+def create_bot(config: dict, cls: Type[commands.Bot]=commands.Bot, **kwargs) -> commands.Bot:
+    """Creates the bot (without loading plugins or logging in).
 
+    Args:
+        config: The bot config.
+        cls: The bot class, e.g. commands.AutoShardedBot for a range of shards.
+        **kwargs: Passed on to `cls`, e.g. shard_ids and shard_count.
 
-@client.event
-async def on_command_error(ctx: commands.Context, e: BaseException):
-    if isinstance(e, (commands.BadArgument, commands.MissingRequiredArgument, commands.CommandOnCooldown)):
-        # do these really warrant a traceback?
-        return
-    logger.error(f'Ignoring exception in command {ctx.command}')
-    logger.error("Logging an uncaught exception",
-                 exc_info=(type(e), e, e.__traceback__))
+    Returns:
+        commands.Bot: the bot.
+    """
+    client = cls(command_prefix=commands.when_mentioned_or('!'), description="League of Legends Trivia",
+                 pm_help=False, owner_id=config["bot"]["owner_id"] or None, **kwargs)
+
+    @client.event
+    async def on_ready():
+        logger.info(f"Logged in. User: {client.user}, ID: {client.user.id}")
+
+    @client.event
+    async def on_command_error(ctx: commands.Context, e: BaseException):
+        if isinstance(e, (commands.BadArgument, commands.MissingRequiredArgument, commands.CommandOnCooldown)):
+            # do these really warrant a traceback?
+            return
+        logger.error(f'Ignoring exception in command {ctx.command}')
+        logger.error("Logging an uncaught exception",
+                     exc_info=(type(e), e, e.__traceback__))
+
+    return client
 
 
 if __name__ == "__main__":
     logging.basicConfig(format='%(asctime)s::%(name)s::%(levelname)s::%(message)s', level=logging.INFO)
-    logger = logging.getLogger('LoLTrivia')
+    config: dict = load_config()
+    client = create_bot(config)
+    plugins.load_plugins(client, config)
     logger.info("Logging in...")
     client.run(config["bot"]["discord_token"])